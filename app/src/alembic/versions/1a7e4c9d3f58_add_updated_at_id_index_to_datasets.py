@@ -0,0 +1,36 @@
+"""Add (updated_at, id) index to datasets for catalog keyset pagination
+
+Revision ID: 1a7e4c9d3f58
+Revises: e83c5a1f0b62
+Create Date: 2026-10-18 14:38:05.116290
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a7e4c9d3f58'
+down_revision: Union[str, Sequence[str], None] = 'e83c5a1f0b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_datasets_updated_at_id',
+            'datasets',
+            ['updated_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_datasets_updated_at_id', table_name='datasets', postgresql_concurrently=True)
@@ -0,0 +1,41 @@
+"""Add (updated, id) index to thing_descriptions for keyset pagination
+
+Revision ID: 3f9c2a7d41b0
+Revises: 62375145aafe
+Create Date: 2026-10-18 09:12:04.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d41b0'
+down_revision: Union[str, Sequence[str], None] = '62375145aafe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently, the table can be large and must stay writable
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_thing_descriptions_updated_id',
+            'thing_descriptions',
+            ['updated', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_thing_descriptions_updated_id',
+            table_name='thing_descriptions',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,49 @@
+"""Add generated search_vector column and GIN index to thing_descriptions
+
+Revision ID: 5e0a8d2b7c19
+Revises: c47d1e9a6f35
+Create Date: 2026-10-18 12:41:09.287361
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0a8d2b7c19'
+down_revision: Union[str, Sequence[str], None] = 'c47d1e9a6f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(td->>'title', '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(td->>'description', '')), 'B') || "
+    "setweight(jsonb_to_tsvector('simple'::regconfig, "
+    "jsonb_path_query_array(td, '$.properties.*.title'), '[\"string\"]'), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'thing_descriptions',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True)),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_thing_descriptions_search_vector',
+            'thing_descriptions',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_thing_descriptions_search_vector', table_name='thing_descriptions')
+    op.drop_column('thing_descriptions', 'search_vector')
@@ -0,0 +1,48 @@
+"""Add change_seq to datasets and dataset_tombstones for catalog delta sync
+
+Revision ID: 6c3b9e2d7a14
+Revises: 1a7e4c9d3f58
+Create Date: 2026-10-18 15:02:44.390127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c3b9e2d7a14'
+down_revision: Union[str, Sequence[str], None] = '1a7e4c9d3f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence('dataset_change_seq')))
+    # Existing rows get numbered by the volatile default
+    op.add_column(
+        'datasets',
+        sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('dataset_change_seq')"), nullable=False),
+    )
+    op.create_index('ix_datasets_change_seq', 'datasets', ['change_seq'], unique=True)
+    op.create_table(
+        'dataset_tombstones',
+        sa.Column('id', sa.Text(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('dataset_change_seq')"), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_dataset_tombstones_change_seq', 'dataset_tombstones', ['change_seq'], unique=True)
+    op.create_index('ix_dataset_tombstones_deleted_at', 'dataset_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_dataset_tombstones_deleted_at', table_name='dataset_tombstones')
+    op.drop_index('ix_dataset_tombstones_change_seq', table_name='dataset_tombstones')
+    op.drop_table('dataset_tombstones')
+    op.drop_index('ix_datasets_change_seq', table_name='datasets')
+    op.drop_column('datasets', 'change_seq')
+    op.execute(sa.schema.DropSequence(sa.Sequence('dataset_change_seq')))
@@ -0,0 +1,43 @@
+"""Add GIN jsonb_path_ops index on thing_descriptions.td
+
+Revision ID: 8b51e0c3d9a2
+Revises: 3f9c2a7d41b0
+Create Date: 2026-10-18 10:03:47.102934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b51e0c3d9a2'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a7d41b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently, the table can be large and must stay writable
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_thing_descriptions_td_path_ops',
+            'thing_descriptions',
+            ['td'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'td': 'jsonb_path_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_thing_descriptions_td_path_ops',
+            table_name='thing_descriptions',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,44 @@
+"""Add td_fragments table for deduplicated TD subtrees
+
+Revision ID: 9d2f6b8e1a47
+Revises: 5e0a8d2b7c19
+Create Date: 2026-10-18 13:42:17.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f6b8e1a47'
+down_revision: Union[str, Sequence[str], None] = '5e0a8d2b7c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'td_fragments',
+        sa.Column('hash', sa.Text(), nullable=False),
+        sa.Column('fragment', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+    op.create_index(
+        'ix_td_fragments_fragment_path_ops',
+        'td_fragments',
+        ['fragment'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'fragment': 'jsonb_path_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_td_fragments_fragment_path_ops', table_name='td_fragments')
+    op.drop_table('td_fragments')
@@ -0,0 +1,56 @@
+"""Drop the thing_descriptions indexes duplicating the primary key and the unique oid index
+
+Revision ID: a91c3e5f7d20
+Revises: f4b8c2e6d915
+Create Date: 2026-10-18 19:02:17.334851
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91c3e5f7d20'
+down_revision: Union[str, Sequence[str], None] = 'f4b8c2e6d915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_thing_descriptions_id was created by init_db for index=True on the
+    # primary key, it may be missing from databases built by the migrations
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_thing_descriptions_id',
+            table_name='thing_descriptions',
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_thing_descriptions_oid_updated',
+            table_name='thing_descriptions',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_thing_descriptions_oid_updated',
+            'thing_descriptions',
+            ['oid'],
+            unique=False,
+            postgresql_include=['id', 'updated'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_thing_descriptions_id',
+            'thing_descriptions',
+            ['id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,127 @@
+"""Add policies table and datasets.policy_ids, moving hasPolicy offers to policies
+
+Revision ID: b5e1d8c3a920
+Revises: 6c3b9e2d7a14
+Create Date: 2026-10-18 16:21:05.730418
+
+"""
+import hashlib
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1d8c3a920'
+down_revision: Union[str, Sequence[str], None] = '6c3b9e2d7a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+datasets = sa.table(
+    'datasets',
+    sa.column('id', sa.Text()),
+    sa.column('dataset_data', postgresql.JSONB()),
+    sa.column('policy_ids', postgresql.ARRAY(sa.Text())),
+)
+policies = sa.table(
+    'policies',
+    sa.column('hash', sa.Text()),
+    sa.column('policy', postgresql.JSONB()),
+)
+
+
+def _hash(policy: dict) -> str:
+    # Same as core.policy.policy_hash, frozen here
+    canonical = json.dumps(policy, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'policies',
+        sa.Column('hash', sa.Text(), nullable=False),
+        sa.Column('policy', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+    op.create_index(
+        'ix_policies_policy_path_ops',
+        'policies',
+        ['policy'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'policy': 'jsonb_path_ops'},
+    )
+    op.add_column(
+        'datasets',
+        sa.Column('policy_ids', postgresql.ARRAY(sa.Text()), server_default=sa.text("'{}'"), nullable=False),
+    )
+
+    # Replace the offers of every dataset by {"@id": ..., "$policy": <hash>}
+    bind = op.get_bind()
+    last_id = None
+    while True:
+        query = sa.select(datasets.c.id, datasets.c.dataset_data).order_by(datasets.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(datasets.c.id > last_id)
+        rows = bind.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        found, updates = {}, []
+        for dataset_id, dataset_data in rows:
+            offers = dataset_data.get("hasPolicy")
+            if not isinstance(offers, list) or not offers:
+                continue
+            references, hashes = [], []
+            for offer in offers:
+                if not isinstance(offer, dict) or "$policy" in offer:
+                    references.append(offer)
+                    continue
+                terms = {key: value for key, value in offer.items() if key != "@id"}
+                digest = _hash(terms)
+                found[digest] = terms
+                hashes.append(digest)
+                references.append({"@id": offer.get("@id"), "$policy": digest})
+            if hashes:
+                updates.append((dataset_id, dict(dataset_data, hasPolicy=references), hashes))
+        if found:
+            bind.execute(
+                postgresql.insert(policies)
+                .values([{"hash": digest, "policy": policy} for digest, policy in found.items()])
+                .on_conflict_do_nothing(index_elements=['hash'])
+            )
+        for dataset_id, dataset_data, hashes in updates:
+            bind.execute(
+                datasets.update()
+                .where(datasets.c.id == dataset_id)
+                .values(dataset_data=dataset_data, policy_ids=hashes)
+            )
+
+    op.create_index('ix_datasets_policy_ids', 'datasets', ['policy_ids'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Inline the offers again
+    op.execute(
+        """
+        UPDATE datasets SET dataset_data = dataset_data || jsonb_build_object('hasPolicy', (
+            SELECT jsonb_agg(coalesce(jsonb_build_object('@id', refs.value -> '@id') || policies.policy, refs.value)
+                             ORDER BY refs.ordinality)
+            FROM jsonb_array_elements(datasets.dataset_data -> 'hasPolicy') WITH ORDINALITY AS refs(value, ordinality)
+            LEFT JOIN policies ON policies.hash = refs.value ->> '$policy'
+        ))
+        WHERE cardinality(policy_ids) > 0
+        """
+    )
+    op.drop_index('ix_datasets_policy_ids', table_name='datasets', postgresql_using='gin')
+    op.drop_column('datasets', 'policy_ids')
+    op.drop_index('ix_policies_policy_path_ops', table_name='policies')
+    op.drop_table('policies')
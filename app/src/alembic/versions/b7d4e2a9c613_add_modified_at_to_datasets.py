@@ -0,0 +1,48 @@
+"""Add modified_at to datasets, replacing the text index on dataset_data->>'modified'
+
+Revision ID: b7d4e2a9c613
+Revises: a91c3e5f7d20
+Create Date: 2026-10-18 19:41:08.216573
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d4e2a9c613'
+down_revision: Union[str, Sequence[str], None] = 'a91c3e5f7d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# ISO 8601 dates and date-times, other values are left NULL like on writes
+ISO_8601 = r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}(:?\d{2})?)?)?$'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('datasets', sa.Column('modified_at', sa.DateTime(timezone=True), nullable=True))
+    # Dates and date-times without offset are UTC, as in crud_catalog.parse_modified
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+    op.execute(
+        sa.text(
+            "UPDATE datasets SET modified_at = (dataset_data ->> 'modified')::timestamptz "
+            "WHERE dataset_data ->> 'modified' ~ :pattern"
+        ).bindparams(pattern=ISO_8601)
+    )
+    op.create_index('ix_datasets_modified_at', 'datasets', ['modified_at'], unique=False)
+    op.drop_index('ix_datasets_modified', table_name='datasets')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_datasets_modified',
+        'datasets',
+        [sa.text("(dataset_data ->> 'modified')")],
+        unique=False,
+    )
+    op.drop_index('ix_datasets_modified_at', table_name='datasets')
+    op.drop_column('datasets', 'modified_at')
@@ -0,0 +1,55 @@
+"""Add covering (id/oid -> updated) indexes to thing_descriptions for ETags
+
+Revision ID: c47d1e9a6f35
+Revises: 8b51e0c3d9a2
+Create Date: 2026-10-18 11:26:51.640117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47d1e9a6f35'
+down_revision: Union[str, Sequence[str], None] = '8b51e0c3d9a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently, the table can be large and must stay writable
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_thing_descriptions_id_updated',
+            'thing_descriptions',
+            ['id'],
+            unique=False,
+            postgresql_include=['updated'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_thing_descriptions_oid_updated',
+            'thing_descriptions',
+            ['oid'],
+            unique=False,
+            postgresql_include=['id', 'updated'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_thing_descriptions_oid_updated',
+            table_name='thing_descriptions',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_thing_descriptions_id_updated',
+            table_name='thing_descriptions',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,34 @@
+"""Drop ix_contract_negotiations_consumer_pid, negotiations are only looked up by providerPid
+
+Revision ID: c5e9a3d1f742
+Revises: b7d4e2a9c613
+Create Date: 2026-10-18 20:12:45.907316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9a3d1f742'
+down_revision: Union[str, Sequence[str], None] = 'b7d4e2a9c613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_contract_negotiations_consumer_pid', table_name='contract_negotiations', postgresql_using='hash')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_contract_negotiations_consumer_pid',
+        'contract_negotiations',
+        ['consumer_pid'],
+        unique=False,
+        postgresql_using='hash',
+    )
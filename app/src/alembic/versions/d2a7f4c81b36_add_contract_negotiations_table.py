@@ -0,0 +1,52 @@
+"""Add contract_negotiations table
+
+Revision ID: d2a7f4c81b36
+Revises: b5e1d8c3a920
+Create Date: 2026-10-18 17:04:12.518273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7f4c81b36'
+down_revision: Union[str, Sequence[str], None] = 'b5e1d8c3a920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'contract_negotiations',
+        sa.Column('provider_pid', sa.Text(), nullable=False),
+        sa.Column('consumer_pid', sa.Text(), nullable=False),
+        sa.Column('state', sa.Text(), nullable=False),
+        sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False),
+        sa.Column('dataset_id', sa.Text(), nullable=True),
+        sa.Column('offer', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('agreement', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('callback_address', sa.Text(), nullable=False),
+        sa.Column('created', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('provider_pid'),
+    )
+    # Transitions stay HOT updates
+    op.execute("ALTER TABLE contract_negotiations SET (fillfactor = 80)")
+    op.create_index(
+        'ix_contract_negotiations_consumer_pid',
+        'contract_negotiations',
+        ['consumer_pid'],
+        unique=False,
+        postgresql_using='hash',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contract_negotiations_consumer_pid', table_name='contract_negotiations', postgresql_using='hash')
+    op.drop_table('contract_negotiations')
@@ -0,0 +1,42 @@
+"""Add a unique index on contract_negotiations.consumer_pid, a contract request is idempotent on it
+
+Revision ID: e2a7c4f9b318
+Revises: c5e9a3d1f742
+Create Date: 2026-10-18 21:07:31.482650
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c4f9b318'
+down_revision: Union[str, Sequence[str], None] = 'c5e9a3d1f742'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently, negotiations keep being written. Fails if a
+    # consumerPid was already used twice, those rows must be resolved first.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_contract_negotiations_consumer_pid',
+            'contract_negotiations',
+            ['consumer_pid'],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_contract_negotiations_consumer_pid',
+            table_name='contract_negotiations',
+            postgresql_concurrently=True,
+        )
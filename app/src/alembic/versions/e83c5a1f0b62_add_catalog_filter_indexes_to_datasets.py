@@ -0,0 +1,46 @@
+"""Add catalog filter indexes (GIN jsonb_path_ops, modified) to datasets
+
+Revision ID: e83c5a1f0b62
+Revises: 9d2f6b8e1a47
+Create Date: 2026-10-18 14:16:52.730418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83c5a1f0b62'
+down_revision: Union[str, Sequence[str], None] = '9d2f6b8e1a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_datasets_dataset_data_path_ops',
+            'datasets',
+            ['dataset_data'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'dataset_data': 'jsonb_path_ops'},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_datasets_modified',
+            'datasets',
+            [sa.text("(dataset_data ->> 'modified')")],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_datasets_modified', table_name='datasets', postgresql_concurrently=True)
+        op.drop_index('ix_datasets_dataset_data_path_ops', table_name='datasets', postgresql_concurrently=True)
@@ -0,0 +1,51 @@
+"""Add outbox_messages table
+
+Revision ID: f4b8c2e6d915
+Revises: d2a7f4c81b36
+Create Date: 2026-10-18 17:46:38.902115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8c2e6d915'
+down_revision: Union[str, Sequence[str], None] = 'd2a7f4c81b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'outbox_messages',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('target', sa.Text(), nullable=False),
+        sa.Column('message', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_outbox_messages_next_attempt_at',
+        'outbox_messages',
+        ['next_attempt_at'],
+        unique=False,
+        postgresql_where=sa.text('next_attempt_at IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_outbox_messages_next_attempt_at',
+        table_name='outbox_messages',
+        postgresql_where=sa.text('next_attempt_at IS NOT NULL'),
+    )
+    op.drop_table('outbox_messages')
@@ -8,8 +8,8 @@ from persistance.database import get_db
 #from persistance.models import ThingDescriptionCreate, ThingDescriptionResponse
 #from persistance.crud import ThingDescriptionCRUD
 from api.routes_catalog import router_catalog
+from api.routes_negotiation import router_negotiation
 from api.routes_wot import router_wot
-# from api.negotiation_router import negotiation_router as negotiations_router
 # from api.transfers_router import transfers_router as transfers_router
 from persistance.models import VersionResponse
 
@@ -21,6 +21,7 @@ router_api = APIRouter(
 )
 
 router_api.include_router(router_catalog)
+router_api.include_router(router_negotiation)
 router_api.include_router(router_wot)
 
 # Exposure of Versions
@@ -1,11 +1,34 @@
+import json
 import logging
-from fastapi import APIRouter
-from persistance.models_catalog import CatalogResponse, DatasetResponse
-from pydantic import BaseModel, Field
-from persistance.crud_catalog import get_dataset
+from datetime import datetime
+from fastapi import APIRouter, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from core.catalog_snapshot import catalog_snapshot, serialize_dataset, validate_dataset
+from persistance.models_catalog import CatalogDeltaResponse, CatalogResponse, Dataset, DatasetLookupResponse
+from persistance.models_wot import CountResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from typing import Any, AsyncIterator, List, Literal, Optional, Tuple
+from persistance.crud_catalog import (
+    count_datasets,
+    dataset_filter_criteria,
+    delete_dataset,
+    get_dataset,
+    get_dataset_changes,
+    get_dataset_raw,
+    get_datasets,
+    get_datasets_raw,
+    get_dataset_page,
+    upsert_datasets,
+    visibility_criteria,
+)
 from persistance.database import get_db
 from fastapi import Depends, HTTPException
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from utils.config import settings
+from utils.fast_json import FastJSONResponse, dumps, join_array
+from utils.json_stream import JSONStreamError, peek_json_documents
+from utils.pagination import encode_cursor, decode_cursor, build_link_header
 
 
 logger = logging.getLogger(__name__)
@@ -16,17 +39,36 @@ router_catalog = APIRouter(
 )
 
 
+class CatalogFilter(BaseModel):
+    """Catalog filter, datasets must match every given member."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    keyword: Optional[str] = None
+    format: Optional[str] = None
+    license: Optional[str] = None
+    modifiedAfter: Optional[str] = None
+    modifiedBefore: Optional[str] = None
+    action: Optional[str] = None
+
+
 class CatalogRequestMessage(BaseModel):
     """Request model pre catalog endpoint."""
 
     context: list[str] = Field(alias="@context")
     type: str = Field(alias="@type")
-    filter: list = Field(default_factory=list)
+    filter: list[CatalogFilter] = Field(default_factory=list)
 
     class Config:
         populate_by_name = True
 
 
+class DatasetLookupRequest(BaseModel):
+    """Request model for batch dataset lookup."""
+
+    ids: list[str] = Field(min_length=1, max_length=settings.CATALOG_LOOKUP_MAX_IDS)
+
+
 class DatasetRequestMessage(BaseModel):
     """Request model for dataset query."""
 
@@ -39,125 +81,248 @@ class DatasetRequestMessage(BaseModel):
 
 
 @router_catalog.post("/request/", response_model=CatalogResponse)
-async def request_catalog(msg: CatalogRequestMessage):
-    payload = {
-        "@context": ["https://w3id.org/dspace/2025/1/context.jsonld"],
-        "@id": "urn:uuid:3afeadd8-ed2d-569e-d634-8394a8836d57",
-        "@type": "Catalog",
-        "participantId": "urn:kezmarok:city-data-provider",
-        "service": [
-            {
-                "@id": "urn:uuid:4aa2dcc8-4d2d-569e-d634-8394a8834d77",
-                "@type": "DataService",
-                "endpointURL": "https://egov.kezmarok.sk/dataspace-connector",
-            }
-        ],
-        "dataset": [
-            {
-                "@id": "urn:uuid:kezmarok-streets-dataset-2025",
-                "@type": "Dataset",
-                "title": "Register ulíc mesta Kežmarok",
-                "description": "Kompletný zoznam ulíc a verejných priestranstiev v meste Kežmarok",
-                "keyword": ["ulice", "streets", "Kežmarok", "verejné priestranstvá"],
-                "issued": "2025-01-15",
-                "modified": "2025-10-20",
-                "license": "https://creativecommons.org/licenses/by-nd/4.0/",
-                "hasPolicy": [
-                    {
-                        "@id": "urn:uuid:policy-streets-kezmarok",
-                        "@type": "Offer",
-                        "permission": [
-                            {
-                                "action": "use",
-                                "constraint": [
-                                    {
-                                        "leftOperand": "spatial",
-                                        "operator": "eq",
-                                        "rightOperand": "http://publications.europa.eu/resource/authority/country/SVK",
-                                    }
-                                ],
-                            }
-                        ],
-                    }
-                ],
-                "distribution": [
-                    {
-                        "@type": "Distribution",
-                        "format": "application/json",
-                        "accessURL": "https://egov.kezmarok.sk/Default.aspx?NavigationState=160:0::plac1280:_144055_5_8",
-                        "accessService": "urn:uuid:4aa2dcc8-4d2d-569e-d634-8394a8834d77",
-                    },
-                    {
-                        "@type": "Distribution",
-                        "format": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        "accessURL": "https://egov.kezmarok.sk/Default.aspx?NavigationState=160:0::plac1280:_144055_5_32",
-                        "accessService": "urn:uuid:4aa2dcc8-4d2d-569e-d634-8394a8834d77",
-                    },
-                ],
-            },
-            {
-                "@id": "urn:uuid:kezmarok-contracts-dataset-2025",
-                "@type": "Dataset",
-                "title": "Zoznam zmlúv mesta Kežmarok",
-                "description": "Register zverejnených zmlúv a dodatkov uzatvorených mestom Kežmarok podľa zákona o slobodnom prístupe k informáciám",
-                "keyword": [
-                    "zmluvy",
-                    "contracts",
-                    "Kežmarok",
-                    "verejné obstarávanie",
-                    "transparency",
-                ],
-                "issued": "2025-01-10",
-                "modified": "2025-10-24",
-                "license": "https://creativecommons.org/licenses/by-nd/4.0/",
-                "hasPolicy": [
-                    {
-                        "@id": "urn:uuid:policy-contracts-kezmarok",
-                        "@type": "Offer",
-                        "permission": [
-                            {
-                                "action": "use",
-                                "constraint": [
-                                    {
-                                        "leftOperand": "spatial",
-                                        "operator": "eq",
-                                        "rightOperand": "http://publications.europa.eu/resource/authority/country/SVK",
-                                    }
-                                ],
-                            }
-                        ],
-                    }
-                ],
-                "distribution": [
-                    {
-                        "@type": "Distribution",
-                        "format": "application/json",
-                        "accessURL": "https://egov.kezmarok.sk/Default.aspx?NavigationState=778:0::plac1889:_144101_5_8",
-                        "accessService": "urn:uuid:4aa2dcc8-4d2d-569e-d634-8394a8834d77",
-                    },
-                    {
-                        "@type": "Distribution",
-                        "format": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        "accessURL": "https://egov.kezmarok.sk/Default.aspx?NavigationState=778:0::plac1889:_144101_5_32",
-                        "accessService": "urn:uuid:4aa2dcc8-4d2d-569e-d634-8394a8834d77",
-                    },
-                ],
-            },
-        ],
-    }
-
-    return CatalogResponse.model_validate(payload)
+async def request_catalog(
+    msg: CatalogRequestMessage,
+    request: Request,
+    limit: int = Query(settings.CATALOG_PAGE_SIZE, ge=1, le=settings.CATALOG_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor taken from the Link header"),
+    order: Literal["id", "updated"] = "id",
+    x_participant_context: Optional[str] = Header(
+        None,
+        description='JSON object of the consumer attributes offers are evaluated against, e.g. '
+        '`{"participantId": "urn:consumer", "spatial": "SVK", "purpose": "research"}`. '
+        'Claimed by the caller, it personalizes the listing and is not access control',
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """DSP catalog of the datasets table
+
+    Served from the pre-serialized snapshot, datasets are validated when they
+    are written rather than on every request. Filters run in SQL and only the
+    matching datasets are returned. With X-Participant-Context, only the
+    datasets with an offer permitting the consumer the action filtered on,
+    or any action, are listed. The catalog is paged with keyset cursors, the
+    next and previous pages are advertised in the Link header and are
+    requested with the same message.
+
+    The participant context, participantId included, is what the caller
+    claims: the service has no authenticated identity of the consumer to
+    check it against. It is a display filter, anyone can list the datasets
+    offered to another participant by sending its id, and it must not be
+    relied on for access control.
+    """
+    criteria = []
+    if x_participant_context is not None:
+        context = _participant_context(x_participant_context)
+        # Offers are evaluated for the action the filters ask for, else for any action
+        actions = {catalog_filter.action for catalog_filter in msg.filter if catalog_filter.action}
+        action = actions.pop() if len(actions) == 1 else None
+        criteria += await visibility_criteria(context, context.get("participantId"), action)
+    for catalog_filter in msg.filter:
+        try:
+            criteria += dataset_filter_criteria(
+                keyword=catalog_filter.keyword,
+                format=catalog_filter.format,
+                license=catalog_filter.license,
+                modified_after=catalog_filter.modifiedAfter,
+                modified_before=catalog_filter.modifiedBefore,
+                action=catalog_filter.action,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid modified date: {e}")
+    try:
+        position = decode_cursor(cursor) if cursor else None
+        dataset_ids, next_position, prev_position = await get_dataset_page(
+            db, criteria, limit=limit, cursor=position, order=order
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    body = await catalog_snapshot.get_subset(db, dataset_ids)
+    headers = {}
+    link = build_link_header(
+        request,
+        encode_cursor(next_position) if next_position else None,
+        encode_cursor(prev_position) if prev_position else None,
+    )
+    if link:
+        headers["Link"] = link
+    logger.info("Catalog succesfuly retrieved")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _participant_context(header: str) -> dict:
+    try:
+        context = json.loads(header)
+    except ValueError:
+        context = None
+    if not isinstance(context, dict):
+        raise HTTPException(status_code=400, detail="X-Participant-Context must be a JSON object")
+    return context
+
+
+@router_catalog.get("/count", response_model=CountResponse)
+async def count_catalog_datasets(exact: bool = False, db: AsyncSession = Depends(get_db)):
+    """Number of datasets, estimated from table statistics unless `exact` is set"""
+    count, is_exact = await count_datasets(db, exact=exact)
+    return CountResponse(count=count, exact=is_exact)
+
+
+@router_catalog.get("/changes", response_model=CatalogDeltaResponse)
+async def catalog_changes(
+    since: int = Query(0, ge=0, description="Watermark returned by the previous request, 0 for a full sync"),
+    modified_since: Optional[datetime] = Query(None, alias="modifiedSince"),
+    limit: int = Query(settings.CATALOG_PAGE_SIZE, ge=1, le=settings.CATALOG_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Datasets written and deleted after a watermark, for catalog mirrors
+
+    Every write and delete takes the next number of a change sequence, and
+    changes are returned in that order with the number of the last one as the
+    new watermark. Callers keep requesting with `since=watermark` while
+    `hasMore` is set. Deleted datasets are reported by id.
+    """
+    changes = await get_dataset_changes(db, since=since, limit=limit + 1, modified_since=modified_since)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    datasets, deleted = [], []
+    for change_seq, dataset_id, dataset_data in changes:
+        if dataset_data is None:
+            deleted.append(dataset_id)
+            continue
+        try:
+            datasets.append(serialize_dataset(dataset_data))
+        except ValidationError as e:
+            logger.error(f"Dataset {dataset_id} left out of the catalog changes: {e}")
+    watermark = changes[-1][0] if changes else since
+    body = (
+        b'{"datasets":[' + b",".join(datasets) + b'],"deleted":' + json.dumps(deleted).encode("utf-8")
+        + b',"watermark":' + str(watermark).encode("ascii") + b',"hasMore":' + (b"true" if has_more else b"false") + b"}"
+    )
+    logger.info("Catalog changes succesfuly retrieved")
+    return Response(content=body, media_type="application/json")
+
+
+@router_catalog.put("/datasets", response_class=StreamingResponse)
+async def upsert_catalog_datasets(request: Request, db: AsyncSession = Depends(get_db)):
+    """Create or replace datasets in bulk, to publish a whole catalog
+
+    Accepts an NDJSON body (one dataset per line) or a JSON array of datasets,
+    each identified by its `@id` (or `id`). Datasets are validated, stored with
+    their members keyed by alias and written in batches of
+    CATALOG_UPSERT_BATCH_SIZE with INSERT ... ON CONFLICT DO UPDATE, the
+    result of every item is streamed back as an NDJSON line, followed by a
+    summary line. A body malformed before its first item is answered with
+    400, later errors end the stream with an error line.
+    """
+    try:
+        documents = await peek_json_documents(request.stream(), settings.BULK_MAX_ITEM_BYTES)
+    except JSONStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(_bulk_upsert(db, documents), media_type="application/x-ndjson")
+
+
+async def _bulk_upsert(db: AsyncSession, documents: AsyncIterator[Tuple[int, Any]]) -> AsyncIterator[bytes]:
+    created = updated = failed = 0
+    batch = []
+
+    async def flush() -> List[dict]:
+        nonlocal created, updated, failed
+        items = list(batch)
+        batch.clear()
+        try:
+            inserted = await upsert_datasets(db, [item[1:] for item in items])
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Catalog upsert batch failed: {e}")
+            failed += len(items)
+            return [{"index": index, "error": "Database error"} for index, _, _, _ in items]
+        created += sum(inserted.values())
+        updated += len(items) - sum(inserted.values())
+        return [{"index": index, "id": dataset_id, "created": inserted[dataset_id]} for index, dataset_id, _, _ in items]
+
+    try:
+        async for index, document in documents:
+            try:
+                if isinstance(document, ValueError):
+                    raise document
+                document, serialized = validate_dataset(document)
+            except (ValueError, ValidationError) as e:
+                failed += 1
+                yield _ndjson({"index": index, "error": str(e)})
+                continue
+            batch.append((index, document["@id"], document, serialized))
+            if len(batch) >= settings.CATALOG_UPSERT_BATCH_SIZE:
+                for result in await flush():
+                    yield _ndjson(result)
+    except JSONStreamError as e:
+        yield _ndjson({"error": str(e)})
+    if batch:
+        for result in await flush():
+            yield _ndjson(result)
+    logger.info(f"Catalog upsert finished, {created} datasets created, {updated} updated, {failed} rejected")
+    yield _ndjson({"created": created, "updated": updated, "failed": failed})
+
+
+def _ndjson(item: dict) -> bytes:
+    return dumps(item) + b"\n"
+
+
+@router_catalog.post("/datasets/lookup", response_model=DatasetLookupResponse)
+async def lookup_catalog_datasets(msg: DatasetLookupRequest, db: AsyncSession = Depends(get_db)):
+    """Datasets of many ids, resolved with a single `id = ANY(...)` query
+
+    Datasets are returned in the requested order, unknown ids are listed in
+    `missing`.
+    """
+    dataset_ids = list(dict.fromkeys(msg.ids))
+    if settings.STRICT_RESPONSE_VALIDATION:
+        found = {dataset.id: dataset.dataset_data for dataset in await get_datasets(db, dataset_ids)}
+        return DatasetLookupResponse(
+            datasets=[Dataset.model_validate(found[dataset_id]) for dataset_id in dataset_ids if dataset_id in found],
+            missing=[dataset_id for dataset_id in dataset_ids if dataset_id not in found],
+        )
+    found = await get_datasets_raw(db, dataset_ids)
+    body = (
+        b'{"datasets":' + join_array(found[dataset_id] for dataset_id in dataset_ids if dataset_id in found)
+        + b',"missing":' + dumps([dataset_id for dataset_id in dataset_ids if dataset_id not in found]) + b"}"
+    )
+    logger.info("Datasets succesfuly retrieved")
+    return FastJSONResponse(body)
 
 
 @router_catalog.post("/dataset/{id}")
 async def query_catalog(
     id: str, msg: DatasetRequestMessage, db: AsyncSession = Depends(get_db)
 ):
+    """Dataset by id
+
+    Datasets are validated when they are written, the stored JSONB is returned
+    as it is unless STRICT_RESPONSE_VALIDATION is set.
+    """
+    if not settings.STRICT_RESPONSE_VALIDATION:
+        body = await get_dataset_raw(db, id)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Dataset not found")
+        return FastJSONResponse(body)
+
     dataset = await get_dataset(db, id)
 
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
 
-    # Extract the JSONB data from the dataset_data column
-    return DatasetResponse.model_validate(dataset.dataset_data)
+    # Extract the JSONB data from the dataset_data column, validated with the
+    # catalog entry model it was written with
+    return Dataset.model_validate(dataset.dataset_data)
     # return dataset.dataset_data
+
+
+@router_catalog.delete("/dataset/{id}")
+async def remove_dataset(id: str, db: AsyncSession = Depends(get_db)):
+    """Delete a dataset
+
+    A tombstone is kept so that catalog mirrors following /changes drop it too.
+    """
+    if not await delete_dataset(db, id):
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    logger.info("Dataset succesfuly deleted")
+    return {"message": "Dataset deleted successfully"}
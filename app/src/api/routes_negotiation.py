@@ -0,0 +1,155 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
+from core.negotiation import NegotiationConflict, NegotiationError, State
+from persistance.crud_negotiation import create_negotiation, get_negotiation, transition_negotiation
+from persistance.database import get_db
+from persistance.models import (
+    ContractAgreementVerificationMessage,
+    ContractNegotiation,
+    ContractNegotiationEventMessage,
+    ContractNegotiationEventType,
+    ContractNegotiationTerminationMessage,
+    ContractRequestMessage,
+    ODRLAgreement,
+    ODRLOffer,
+)
+from persistance.tables import ContractNegotiationDB
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+router_negotiation = APIRouter(
+    prefix="/negotiations",
+    tags=["Negotiation router"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+def _negotiation(negotiation: ContractNegotiationDB) -> ContractNegotiation:
+    return ContractNegotiation(
+        context=settings.CATALOG_CONTEXT,
+        id=negotiation.provider_pid,
+        consumer_pid=negotiation.consumer_pid,
+        provider_pid=negotiation.provider_pid,
+        state=negotiation.state,
+    )
+
+
+def _offer_document(offer: Union[ODRLOffer, str]) -> dict:
+    if isinstance(offer, str):
+        return {"@id": offer}
+    return offer.model_dump(mode="json", by_alias=True, exclude_none=True)
+
+
+async def _transition(
+    db: AsyncSession, provider_pid: str, state: State, consumer_pid: Optional[str] = None, **values
+) -> ContractNegotiation:
+    try:
+        negotiation = await transition_negotiation(db, provider_pid, state, consumer_pid=consumer_pid, **values)
+    except NegotiationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NegotiationConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if negotiation is None:
+        raise HTTPException(status_code=404, detail="Negotiation not found")
+    logger.info(f"Negotiation {provider_pid} succesfuly moved to {state.value}")
+    return _negotiation(negotiation)
+
+
+def _check_provider_pid(provider_pid: str, msg_provider_pid: Optional[str]):
+    if msg_provider_pid is not None and msg_provider_pid != provider_pid:
+        raise HTTPException(status_code=400, detail="providerPid does not match the negotiation")
+
+
+# Consumer messages (DSP provider endpoints)
+
+@router_negotiation.post("/request", response_model=ContractNegotiation, status_code=201)
+async def request_negotiation(msg: ContractRequestMessage, db: AsyncSession = Depends(get_db)):
+    """Start a negotiation with the contract request of a consumer
+
+    A request repeated with the same consumerPid returns the negotiation it
+    started rather than a second one.
+    """
+    if msg.provider_pid is not None:
+        raise HTTPException(status_code=400, detail="An initial request has no providerPid")
+    if msg.consumer_pid is None:
+        raise HTTPException(status_code=400, detail="consumerPid is required")
+    negotiation = await create_negotiation(db, msg.consumer_pid, _offer_document(msg.offer), msg.callback_address)
+    logger.info(f"Negotiation {negotiation.provider_pid} succesfuly requested")
+    return _negotiation(negotiation)
+
+
+@router_negotiation.get("/{provider_pid}", response_model=ContractNegotiation)
+async def read_negotiation(provider_pid: str, db: AsyncSession = Depends(get_db)):
+    negotiation = await get_negotiation(db, provider_pid)
+    if negotiation is None:
+        raise HTTPException(status_code=404, detail="Negotiation not found")
+    return _negotiation(negotiation)
+
+
+@router_negotiation.post("/{provider_pid}/request", response_model=ContractNegotiation)
+async def counter_request_negotiation(provider_pid: str, msg: ContractRequestMessage, db: AsyncSession = Depends(get_db)):
+    """Counter-request of the consumer to an offer"""
+    _check_provider_pid(provider_pid, msg.provider_pid)
+    offer = _offer_document(msg.offer)
+    return await _transition(
+        db,
+        provider_pid,
+        State.REQUESTED,
+        consumer_pid=msg.consumer_pid,
+        offer=offer,
+        dataset_id=offer.get("odrl:target"),
+        callback_address=msg.callback_address,
+    )
+
+
+@router_negotiation.post("/{provider_pid}/events", response_model=ContractNegotiation)
+async def negotiation_event(provider_pid: str, msg: ContractNegotiationEventMessage, db: AsyncSession = Depends(get_db)):
+    """Acceptance of the offer by the consumer"""
+    _check_provider_pid(provider_pid, msg.provider_pid)
+    if msg.event_type != ContractNegotiationEventType.ACCEPTED:
+        raise HTTPException(status_code=400, detail="Consumers only send ACCEPTED events")
+    return await _transition(db, provider_pid, State.ACCEPTED, consumer_pid=msg.consumer_pid)
+
+
+@router_negotiation.post("/{provider_pid}/agreement/verification", response_model=ContractNegotiation)
+async def verify_agreement(
+    provider_pid: str, msg: ContractAgreementVerificationMessage, db: AsyncSession = Depends(get_db)
+):
+    """Verification of the agreement by the consumer"""
+    _check_provider_pid(provider_pid, msg.provider_pid)
+    return await _transition(db, provider_pid, State.VERIFIED, consumer_pid=msg.consumer_pid)
+
+
+@router_negotiation.post("/{provider_pid}/termination", response_model=ContractNegotiation)
+async def terminate_negotiation(
+    provider_pid: str, msg: ContractNegotiationTerminationMessage, db: AsyncSession = Depends(get_db)
+):
+    """Termination of the negotiation, by either party"""
+    _check_provider_pid(provider_pid, msg.provider_pid)
+    return await _transition(db, provider_pid, State.TERMINATED, consumer_pid=msg.consumer_pid)
+
+
+# Provider actions
+
+@router_negotiation.post("/{provider_pid}/offer", response_model=ContractNegotiation)
+async def offer_negotiation(provider_pid: str, offer: ODRLOffer, db: AsyncSession = Depends(get_db)):
+    """Offer or counter-offer of the provider to a request"""
+    if not offer.target:
+        raise HTTPException(status_code=400, detail="Offer must have odrl:target")
+    document = _offer_document(offer)
+    return await _transition(db, provider_pid, State.OFFERED, offer=document, dataset_id=document.get("odrl:target"))
+
+
+@router_negotiation.post("/{provider_pid}/agreement", response_model=ContractNegotiation)
+async def agree_negotiation(provider_pid: str, agreement: ODRLAgreement, db: AsyncSession = Depends(get_db)):
+    """Agreement of the provider to the requested or accepted offer"""
+    document = agreement.model_dump(mode="json", by_alias=True, exclude_none=True)
+    return await _transition(db, provider_pid, State.AGREED, agreement=document)
+
+
+@router_negotiation.post("/{provider_pid}/finalization", response_model=ContractNegotiation)
+async def finalize_negotiation(provider_pid: str, db: AsyncSession = Depends(get_db)):
+    """Finalization of a verified agreement by the provider"""
+    return await _transition(db, provider_pid, State.FINALIZED)
@@ -1,11 +1,26 @@
 import uuid
+import json
+import zlib
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Body, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import DataError, DBAPIError, ProgrammingError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from persistance.database import get_db
-from persistance.models_wot import ThingDescriptionCreate, ThingDescriptionResponse
-from persistance.crud_wot import ThingDescriptionCRUD
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
+from core.jsonpath import JSONPathError, compile_jsonpath
+from core.notifications import EVENT_TYPES, change_feed
+from core.td_cache import td_cache
+from core.td_validation import TDSchemaError, td_validator
+from persistance.database import get_db, is_query_canceled
+from persistance.models_wot import CountResponse, ThingDescriptionCreate, ThingDescriptionResponse
+from persistance.crud_wot import ThingDescriptionCRUD, containment_document
+from utils.config import settings
+from utils.etag import make_etag, etag_matches, expected_versions
+from utils.fast_json import FastJSONResponse
+from utils.json_stream import JSONStreamError, peek_json_documents
+from utils.pagination import encode_cursor, decode_cursor, build_link_header
 
 logger = logging.getLogger(__name__)
 
@@ -18,81 +33,524 @@ router_wot = APIRouter(
 @router_wot.post("/", response_model=ThingDescriptionResponse)
 async def create_thing_description(
     td: ThingDescriptionCreate,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new Thing Description"""
-    td_data = td.dict()
+    td_data = await _check_schema(request, td)
     db_td = await ThingDescriptionCRUD.create(db, td_data)
     logger.info("Asset succesfuly posted")
     return db_td
 
+async def _check_schema(request: Request, td: ThingDescriptionCreate) -> dict:
+    """Validate against the W3C TD 1.1 JSON Schema, large bodies off the event loop
+
+    Returns the validated document, the one to store.
+    """
+    td_data = td.model_dump(exclude_unset=True)
+    error = await td_validator.validate(td_data, int(request.headers.get("content-length") or 0))
+    if error:
+        raise HTTPException(status_code=422, detail=f"Invalid Thing Description: {error}")
+    return td_data
+
+@router_wot.post("/bulk", response_class=StreamingResponse)
+async def bulk_create_thing_descriptions(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Create Thing Descriptions in bulk
+
+    Accepts an NDJSON body (one TD per line) or a JSON array of TDs. Items are
+    schema validated and written in batches of BULK_BATCH_SIZE and the result of every item is streamed
+    back as an NDJSON line, followed by a summary line. A body malformed before
+    its first item is answered with 400, later errors end the stream with an
+    error line.
+    """
+    try:
+        documents = await peek_json_documents(request.stream(), settings.BULK_MAX_ITEM_BYTES)
+    except JSONStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(_bulk_ingest(db, documents), media_type="application/x-ndjson")
+
+async def _bulk_ingest(db: AsyncSession, documents: AsyncIterator[Tuple[int, Any]]) -> AsyncIterator[bytes]:
+    created = failed = 0
+    batch = []
+
+    async def flush() -> List[dict]:
+        nonlocal created, failed
+        errors = await td_validator.validate_many([td for _, td in batch])
+        results = [
+            {"index": index, "error": f"Invalid Thing Description: {error}"}
+            for (index, _), error in zip(batch, errors) if error
+        ]
+        failed += len(results)
+        valid = [(index, td) for (index, td), error in zip(batch, errors) if not error]
+        batch.clear()
+        if not valid:
+            return results
+        indexes = [index for index, _ in valid]
+        try:
+            ids = await ThingDescriptionCRUD.create_many(db, [td for _, td in valid])
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Bulk batch failed: {e}")
+            failed += len(valid)
+            results += [{"index": index, "error": "Database error"} for index in indexes]
+        else:
+            created += len(valid)
+            results += [{"index": index, "id": td_id, "oid": str(oid)} for index, (td_id, oid) in zip(indexes, ids)]
+        return sorted(results, key=lambda result: result["index"])
+
+    try:
+        async for index, document in documents:
+            try:
+                if isinstance(document, ValueError):
+                    raise document
+                td = ThingDescriptionCreate.model_validate(document)
+            except (ValueError, ValidationError) as e:
+                failed += 1
+                yield _ndjson({"index": index, "error": str(e)})
+                continue
+            # Validated and stored as sent, without the defaults of the model
+            batch.append((index, td.model_dump(exclude_unset=True)))
+            if len(batch) >= settings.BULK_BATCH_SIZE:
+                for result in await flush():
+                    yield _ndjson(result)
+    except JSONStreamError as e:
+        yield _ndjson({"error": str(e)})
+    if batch:
+        for result in await flush():
+            yield _ndjson(result)
+    logger.info(f"Bulk upload finished, {created} assets posted, {failed} rejected")
+    yield _ndjson({"created": created, "failed": failed})
+
+def _ndjson(item: dict) -> bytes:
+    return json.dumps(item).encode("utf-8") + b"\n"
+
+@router_wot.get("/export", response_class=StreamingResponse)
+async def export_thing_descriptions(
+    gzip: bool = Query(False, description="Compress the stream with gzip"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Export the whole directory as NDJSON
+
+    One ThingDescriptionResponse per line, streamed from a server-side cursor.
+    """
+    headers = {"Content-Disposition": 'attachment; filename="things.ndjson"'}
+    body = _export_lines(db)
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        body = _gzip_stream(body)
+    logger.info("Assets export started")
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+async def _export_lines(db: AsyncSession) -> AsyncIterator[bytes]:
+    chunk = bytearray()
+    first = True
+    async for td_id, oid, td in ThingDescriptionCRUD.stream_all(db, batch_size=settings.EXPORT_BATCH_SIZE):
+        chunk += b'{"id":%d,"oid":"%s","td":%s}\n' % (td_id, str(oid).encode(), td.encode("utf-8"))
+        # The first row goes out immediately to keep time to first byte low
+        if first or len(chunk) >= settings.EXPORT_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+            first = False
+    if chunk:
+        yield bytes(chunk)
+
+async def _gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    first = True
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
+@router_wot.get("/events", response_class=StreamingResponse)
+@router_wot.get("/events/{event_type}", response_class=StreamingResponse)
+async def stream_thing_events(
+    request: Request,
+    event_type: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-Sent Events of created, updated and deleted Thing Descriptions
+
+    Optionally restricted to one of thing_created, thing_updated or thing_deleted.
+    Reconnecting clients resume from Last-Event-ID, a `resync` event tells them
+    the missed events are gone and the directory has to be listed again. It is
+    also sent to connected clients when the server itself may have missed
+    changes.
+    """
+    if event_type is not None and event_type not in EVENT_TYPES.values():
+        raise HTTPException(status_code=404, detail="Unknown event type")
+    types = {event_type} if event_type else None
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(
+        _event_stream(request, last_event_id, types), media_type="text/event-stream", headers=headers
+    )
+
+async def _event_stream(request: Request, last_event_id: Optional[str], types) -> AsyncIterator[bytes]:
+    try:
+        subscription = change_feed.subscribe(last_event_id, types)
+    except LookupError:
+        yield b"event: resync\ndata: {}\n\n"
+        subscription = change_feed.subscribe(None, types)
+    try:
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keep-alive\n\n"
+                continue
+            yield f"id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n".encode("utf-8")
+        # Drain what was buffered before the overflow, the client resumes from there
+        while not subscription.queue.empty():
+            event = subscription.queue.get_nowait()
+            yield f"id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n".encode("utf-8")
+    finally:
+        change_feed.unsubscribe(subscription)
+
+@router_wot.get("/count", response_model=CountResponse)
+async def count_thing_descriptions(
+    q: Optional[str] = Query(None, description="Full-text search in titles, descriptions and property titles"),
+    where: Optional[List[str]] = Query(None, description="Repeatable `path=value` containment condition"),
+    exact: bool = Query(False, description="Count the rows instead of using table statistics"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Count Thing Descriptions
+
+    Without filters the count is estimated from the table statistics. Filtered
+    counts are exact up to COUNT_EXACT_CAP rows and estimated above it.
+    """
+    try:
+        document = containment_document([_parse_condition(condition) for condition in where]) if where else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    count, is_exact = await ThingDescriptionCRUD.count(db, text_query=q, document=document, exact=exact)
+    return CountResponse(count=count, exact=is_exact)
+
+def projection_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma separated dot paths of the td members to return, e.g. `title,properties.temperature`"
+    )
+) -> Optional[List[str]]:
+    """Parse the `fields` projection parameter"""
+    if not fields:
+        return None
+    parsed = [field.strip() for field in fields.split(",") if field.strip()]
+    if len(parsed) > settings.PROJECTION_MAX_FIELDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.PROJECTION_MAX_FIELDS} fields can be requested")
+    if any(not segment for field in parsed for segment in field.split(".")):
+        raise HTTPException(status_code=400, detail="Invalid fields")
+    return parsed or None
+
 @router_wot.get("/{td_id}", response_model=ThingDescriptionResponse)
 async def get_thing_description(
     td_id: int,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[List[str]] = Depends(projection_fields),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get Thing Description by ID"""
-    db_td = await ThingDescriptionCRUD.get_by_id(db, td_id)
-    if not db_td:
-        raise HTTPException(status_code=404, detail="Thing Description not found")
-    logger.info("Asset succesfuly retrieved")
-    return db_td
+    """Get Thing Description by ID
+
+    Served from the in-process cache when possible, If-None-Match is answered
+    with 304 after a lookup of the update time only. A `fields` projection is
+    computed by Postgres and bypasses both.
+    """
+    if fields:
+        db_td = await ThingDescriptionCRUD.get_by_id(db, td_id, fields=fields)
+        if not db_td:
+            raise HTTPException(status_code=404, detail="Thing Description not found")
+        logger.info("Asset succesfuly retrieved")
+        return _serve(db_td)
+    cached = td_cache.get(td_id)
+    if cached:
+        return _cached_response(cached, if_none_match)
+    if if_none_match:
+        updated = await ThingDescriptionCRUD.get_version(db, td_id)
+        if updated is None:
+            raise HTTPException(status_code=404, detail="Thing Description not found")
+        etag = make_etag(td_id, updated)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+    return await _read_response(db, td_id=td_id)
 
 @router_wot.get("/oid/{oid}", response_model=ThingDescriptionResponse)
 async def get_thing_description_by_oid(
     oid: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[List[str]] = Depends(projection_fields),
     db: AsyncSession = Depends(get_db)
 ):
     """Get Thing Description by OID"""
-    db_td = await ThingDescriptionCRUD.get_by_oid(db, oid)
-    if not db_td:
-        raise HTTPException(status_code=404, detail="Thing Description not found")
+    if fields:
+        db_td = await ThingDescriptionCRUD.get_by_oid(db, oid, fields=fields)
+        if not db_td:
+            raise HTTPException(status_code=404, detail="Thing Description not found")
+        logger.info("Asset succesfuly retrieved")
+        return _serve(db_td)
+    cached = td_cache.get_by_oid(oid)
+    if cached:
+        return _cached_response(cached, if_none_match)
+    if if_none_match:
+        version = await ThingDescriptionCRUD.get_version_by_oid(db, oid)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Thing Description not found")
+        etag = make_etag(*version)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+    return await _read_response(db, oid=oid)
+
+@router_wot.get("/cache/stats")
+async def get_cache_stats():
+    """Hit, miss and eviction counters of the Thing Description cache"""
+    return td_cache.stats()
+
+async def _read_response(db: AsyncSession, td_id: Optional[int] = None, oid: Optional[uuid.UUID] = None) -> Response:
+    """Serialize and cache a whole Thing Description
+
+    The document is sent as the JSON text stored by Postgres, it is only
+    validated again through ThingDescriptionResponse in strict mode. It is not
+    cached when a write invalidated the cache during the read.
+    """
+    generation = td_cache.generation
+    if settings.STRICT_RESPONSE_VALIDATION:
+        if td_id is not None:
+            db_td = await ThingDescriptionCRUD.get_by_id(db, td_id)
+        else:
+            db_td = await ThingDescriptionCRUD.get_by_oid(db, oid)
+        if not db_td:
+            raise HTTPException(status_code=404, detail="Thing Description not found")
+        body = ThingDescriptionResponse.model_validate(db_td).model_dump_json().encode("utf-8")
+    else:
+        db_td = await ThingDescriptionCRUD.get_raw(db, td_id=td_id, oid=oid)
+        if not db_td:
+            raise HTTPException(status_code=404, detail="Thing Description not found")
+        body = b'{"id":%d,"oid":"%s","td":%s}' % (db_td.id, str(db_td.oid).encode("ascii"), db_td.td)
+    etag = make_etag(db_td.id, db_td.updated)
+    td_cache.put(db_td.id, db_td.oid, body, etag, generation=generation)
     logger.info("Asset succesfuly retrieved")
-    return db_td
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+def _serve(result, response: Optional[Response] = None):
+    """Thing Description rows as a FastJSONResponse, or as they are in strict mode
+
+    Returning a Response skips the response_model validation of FastAPI, rows
+    hold documents validated on write. Headers set on `response` are kept.
+    """
+    if settings.STRICT_RESPONSE_VALIDATION:
+        return result
+    if isinstance(result, list):
+        content = [{"id": row.id, "oid": row.oid, "td": row.td} for row in result]
+    else:
+        content = {"id": result.id, "oid": result.oid, "td": result.td}
+    return FastJSONResponse(content, headers=response.headers if response is not None else None)
+
+def _cached_response(cached, if_none_match: Optional[str]) -> Response:
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers={"ETag": cached.etag})
+    logger.info("Asset succesfuly retrieved")
+    return Response(content=cached.body, media_type="application/json", headers={"ETag": cached.etag})
 
 @router_wot.get("/", response_model=List[ThingDescriptionResponse])
 async def list_thing_descriptions(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated, OFFSET based paging. Use cursor instead"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor taken from the Link header"),
+    order: Literal["id", "updated"] = "id",
+    q: Optional[str] = Query(None, description="Full-text search in titles, descriptions and property titles"),
+    fields: Optional[List[str]] = Depends(projection_fields),
+    total: bool = Query(False, description="Add the X-Total-Count header"),
     db: AsyncSession = Depends(get_db)
 ):
-    """List all Thing Descriptions"""
+    """List all Thing Descriptions
+
+    Pages are addressed by keyset cursors, the next and previous pages are
+    advertised in the Link header. With `q` the results are ranked by relevance.
+    With `total` the X-Total-Count header carries the (possibly estimated) total.
+    """
+    if total:
+        count, is_exact = await ThingDescriptionCRUD.count(db, text_query=q)
+        response.headers["X-Total-Count"] = str(count)
+        response.headers["X-Total-Count-Exact"] = "true" if is_exact else "false"
+    if skip and not q:
+        logger.info("Assets succesfuly retrieved")
+        return _serve(await ThingDescriptionCRUD.get_all(db, skip=skip, limit=limit, fields=fields), response)
+    try:
+        position = decode_cursor(cursor) if cursor else None
+        if q:
+            items, next_position, prev_position = await _search_page(db, q, skip, limit, position, fields)
+        else:
+            items, next_position, prev_position = await ThingDescriptionCRUD.get_page(
+                db, limit=limit, cursor=position, order=order, fields=fields
+            )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    link = build_link_header(
+        request,
+        encode_cursor(next_position) if next_position else None,
+        encode_cursor(prev_position) if prev_position else None,
+    )
+    if link:
+        response.headers["Link"] = link
     logger.info("Assets succesfuly retrieved")
-    return await ThingDescriptionCRUD.get_all(db, skip=skip, limit=limit)
+    return _serve(items, response)
+
+async def _search_page(
+    db: AsyncSession, q: str, skip: int, limit: int, position: Optional[dict], fields: Optional[List[str]]
+):
+    # Ranked results are paged by offset, carried in the cursor
+    offset = position.get("offset", skip) if position else skip
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    items, has_more = await ThingDescriptionCRUD.search_text(db, q, offset=offset, limit=limit, fields=fields)
+    next_position = {"order": "rank", "offset": offset + limit} if has_more else None
+    prev_position = {"order": "rank", "offset": max(offset - limit, 0)} if offset else None
+    return items, next_position, prev_position
 
 @router_wot.put("/{td_id}", response_model=ThingDescriptionResponse)
 async def update_thing_description(
     td_id: int,
     td: ThingDescriptionCreate,
+    request: Request,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """Update Thing Description"""
-    td_data = td.dict()
-    db_td = await ThingDescriptionCRUD.update(db, td_id, td_data)
+    """Update Thing Description
+
+    With If-Match the update only applies to the given version, else 412.
+    """
+    td_data = await _check_schema(request, td)
+    expected = expected_versions(if_match, td_id)
+    db_td = await ThingDescriptionCRUD.update(db, td_id, td_data, if_updated=expected)
     if not db_td:
-        raise HTTPException(status_code=404, detail="Thing Description not found")
+        await _raise_not_found_or_precondition_failed(db, td_id, expected)
+    response.headers["ETag"] = make_etag(db_td.id, db_td.updated)
     logger.info("Asset succesfuly updated")
     return db_td
 
+@router_wot.patch("/{td_id}", response_model=ThingDescriptionResponse)
+async def patch_thing_description(
+    td_id: int,
+    response: Response,
+    patch: Dict[str, Any] = Body(..., media_type="application/merge-patch+json"),
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Partially update Thing Description with a JSON Merge Patch (RFC 7396)
+
+    The patched document is validated against the TD schema like a created one.
+    """
+    if "title" in patch and not isinstance(patch["title"], str):
+        raise HTTPException(status_code=400, detail="title must remain a string")
+    expected = expected_versions(if_match, td_id)
+    try:
+        db_td = await ThingDescriptionCRUD.patch(db, td_id, patch, if_updated=expected)
+    except TDSchemaError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid Thing Description: {e}")
+    if not db_td:
+        await _raise_not_found_or_precondition_failed(db, td_id, expected)
+    response.headers["ETag"] = make_etag(db_td.id, db_td.updated)
+    logger.info("Asset succesfuly patched")
+    return db_td
+
 @router_wot.delete("/{td_id}")
 async def delete_thing_description(
     td_id: int,
+    if_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete Thing Description"""
-    success = await ThingDescriptionCRUD.delete(db, td_id)
+    expected = expected_versions(if_match, td_id)
+    success = await ThingDescriptionCRUD.delete(db, td_id, if_updated=expected)
     if not success:
-        raise HTTPException(status_code=404, detail="Thing Description not found")
+        await _raise_not_found_or_precondition_failed(db, td_id, expected)
     logger.info("Asset succesfuly deleted")
     return {"message": "Thing Description deleted successfully"}
 
+async def _raise_not_found_or_precondition_failed(db: AsyncSession, td_id: int, expected: Optional[list]):
+    if expected is not None and await ThingDescriptionCRUD.get_version(db, td_id) is not None:
+        raise HTTPException(status_code=412, detail="Thing Description was modified")
+    raise HTTPException(status_code=404, detail="Thing Description not found")
+
 @router_wot.get("/search/", response_model=List[ThingDescriptionResponse])
 async def search_thing_descriptions(
-    field: str,
-    value: str,
+    field: Optional[str] = None,
+    value: Optional[str] = None,
+    where: Optional[List[str]] = Query(
+        None,
+        description="Repeatable `path=value` condition, e.g. `properties.temperature.type=number` "
+        "or `@type[]=saref:Sensor`. Values are parsed as JSON when possible."
+    ),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[List[str]] = Depends(projection_fields),
     db: AsyncSession = Depends(get_db)
 ):
-    """Search Thing Descriptions by JSONB field"""
-    results = await ThingDescriptionCRUD.query_jsonb_field(db, field, value)
+    """Search Thing Descriptions by JSONB field
+
+    With `field` and `value` the top level key is compared as text. The `where`
+    form combines nested conditions into one JSONB containment query.
+    """
+    if where:
+        try:
+            conditions = [_parse_condition(condition) for condition in where]
+            if field is not None and value is not None:
+                conditions.append((field, value))
+            document = containment_document(conditions)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        results = await ThingDescriptionCRUD.query_containment(db, document, limit=limit, fields=fields)
+    elif field is not None and value is not None:
+        results = await ThingDescriptionCRUD.query_jsonb_field(db, field, value, fields=fields)
+    else:
+        raise HTTPException(status_code=400, detail="Provide field and value, or where conditions")
     logger.info("Asset succesfuly retrieved")
-    return results
\ No newline at end of file
+    return _serve(results)
+
+@router_wot.get("/search/jsonpath", response_model=List[Any])
+async def search_thing_descriptions_jsonpath(
+    query: str = Query(..., description="JSONPath expression (RFC 9535), e.g. `$.properties[?(@.type=='number')]`"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search Thing Descriptions with JSONPath (WoT Discovery)
+
+    The expression is translated to a Postgres jsonpath, filtering and projection
+    run in the database and the matched values are returned.
+    """
+    try:
+        path = compile_jsonpath(query)
+    except JSONPathError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        results = await ThingDescriptionCRUD.query_jsonpath(
+            db, path, limit=limit, timeout_ms=settings.JSONPATH_TIMEOUT_MS
+        )
+    except DBAPIError as e:
+        if is_query_canceled(e):
+            raise HTTPException(status_code=503, detail="JSONPath query timed out")
+        if isinstance(e, (DataError, ProgrammingError)):
+            raise HTTPException(status_code=400, detail="JSONPath query could not be evaluated")
+        raise
+    logger.info("Asset succesfuly retrieved")
+    if settings.STRICT_RESPONSE_VALIDATION:
+        return results
+    return FastJSONResponse(results)
+
+def _parse_condition(condition: str) -> tuple:
+    path, sep, raw = condition.partition("=")
+    if not sep:
+        raise ValueError(f"Condition must be path=value: {condition}")
+    try:
+        return path.strip(), json.loads(raw)
+    except ValueError:
+        return path.strip(), raw
@@ -0,0 +1,96 @@
+"""Response building time of the DSP catalog, paged and unpaged
+
+Run from app/src, with the service settings (.env) in place:
+
+    python -m benchmarks.bench_catalog_pages [--datasets 20000] [--page-size 100]
+
+Compares, per request, validating and serializing the whole catalog with
+CatalogResponse (the former behaviour) and assembling one page from the
+pre-serialized snapshot. The keyset query
+selecting the ids of a page is not included, it reads `page-size` entries of a
+btree index.
+"""
+import argparse
+import time
+from core.catalog_snapshot import CatalogSnapshot, catalog_header, serialize_dataset
+from persistance.models_catalog import CatalogResponse
+
+
+def make_dataset(index: int) -> dict:
+    service = "urn:uuid:4aa2dcc8-4d2d-569e-d634-8394a8834d77"
+    return {
+        "@id": f"urn:uuid:bench-dataset-{index:08d}",
+        "@type": "Dataset",
+        "title": f"Dataset {index}",
+        "keyword": ["benchmark", f"group-{index % 100}"],
+        "modified": "2025-10-20",
+        "license": "https://creativecommons.org/licenses/by-nd/4.0/",
+        "hasPolicy": [
+            {
+                "@id": f"urn:uuid:policy-{index % 10}",
+                "@type": "Offer",
+                "permission": [
+                    {
+                        "action": "use",
+                        "constraint": [
+                            {
+                                "leftOperand": "spatial",
+                                "operator": "eq",
+                                "rightOperand": "http://publications.europa.eu/resource/authority/country/SVK",
+                            }
+                        ],
+                    }
+                ],
+            }
+        ],
+        "distribution": [
+            {"@type": "Distribution", "format": "application/json", "accessService": service},
+            {"@type": "Distribution", "format": "text/csv", "accessService": service},
+        ],
+    }
+
+
+def measure(label: str, repeat: int, build):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = build()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<34} {elapsed * 1000:>10.3f} ms {len(body) / 1024:>12,.1f} KiB")
+
+
+def main(count: int, page_size: int, repeat: int):
+    datasets = [make_dataset(i) for i in range(count)]
+    snapshot = CatalogSnapshot()
+    start = time.perf_counter()
+    for change_seq, dataset in enumerate(datasets, start=1):
+        snapshot.upsert(dataset["@id"], serialize_dataset(dataset), change_seq)
+    print(f"Snapshot of {count} datasets built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    page_ids = [dataset["@id"] for dataset in datasets[count // 2:count // 2 + page_size]]
+
+    def validate_all() -> bytes:
+        payload = dict(catalog_header(), dataset=datasets)
+        return CatalogResponse.model_validate(payload).model_dump_json(by_alias=True).encode("utf-8")
+
+    def page() -> bytes:
+        return _run(snapshot.get_subset(None, page_ids))
+
+    measure("unpaged, validated per request", max(1, repeat // 10), validate_all)
+    measure(f"page of {page_size}, snapshot", repeat, page)
+
+
+def _run(coroutine):
+    # The snapshot is loaded, its coroutines complete without reaching the database
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("Snapshot tried to reach the database")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--datasets", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.datasets, args.page_size, args.repeat)
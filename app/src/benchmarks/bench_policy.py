@@ -0,0 +1,121 @@
+"""Latency of ODRL policy evaluation
+
+Run from app/src, with the service settings (.env) in place:
+
+    python -m benchmarks.bench_policy [--depth 6] [--fanout 3] [--iterations 20000]
+
+Builds an Offer whose permission holds alternating and/or constraints nested
+`depth` levels deep with `fanout` operands per level, and reports the time to
+validate it as an ODRLOffer and walk the pydantic tree, to compile it, and to
+evaluate it compiled and through the engine cache, hashing the document or
+with its hash known.
+"""
+import argparse
+import operator
+import time
+from datetime import datetime, timedelta, timezone
+from core.policy import PolicyEngine
+from persistance.models import ODRLConstraint, ODRLOffer
+
+LEFT_OPERANDS = [
+    ("spatial", "eq", "SVK"),
+    ("purpose", "isAnyOf", "research"),
+    ("dateTime", "lt", "2030-01-01T00:00:00Z"),
+    ("count", "lteq", 100),
+    # Catalog offers carry numbers as strings, compared as numbers
+    ("quantity", "lteq", "100"),
+]
+CONTEXT = {
+    "spatial": "SVK",
+    "purpose": "research",
+    "dateTime": datetime.now(timezone.utc),
+    "count": 10,
+    "quantity": 20,
+}
+
+
+def make_constraint(depth: int, fanout: int, index: int = 0) -> dict:
+    if depth == 0:
+        left, operator_name, right = LEFT_OPERANDS[index % len(LEFT_OPERANDS)]
+        return {"odrl:leftOperand": left, "odrl:operator": f"odrl:{operator_name}", "odrl:rightOperand": right}
+    kind = "odrl:and" if depth % 2 else "odrl:or"
+    return {kind: [make_constraint(depth - 1, fanout, index + i) for i in range(fanout)]}
+
+
+def make_offer(depth: int, fanout: int) -> dict:
+    return {
+        "@context": ["https://w3id.org/dspace/2025/1/context.jsonld"],
+        "@id": f"urn:circ:bench:offer:{depth}x{fanout}",
+        "@type": "odrl:Offer",
+        "odrl:permission": [{"odrl:action": "odrl:use", "odrl:constraint": [make_constraint(depth, fanout)]}],
+        "odrl:prohibition": [{
+            "odrl:action": "odrl:distribute",
+            "odrl:constraint": [{"odrl:leftOperand": "spatial", "odrl:operator": "odrl:neq", "odrl:rightOperand": "SVK"}],
+        }],
+    }
+
+
+_NAIVE = {"eq": operator.eq, "neq": operator.ne, "lt": operator.lt, "lteq": operator.le}
+
+
+def naive_satisfied(constraint, context: dict) -> bool:
+    """Reference evaluation walking the validated pydantic tree on every request"""
+    if isinstance(constraint, ODRLConstraint):
+        value = context.get(constraint.left_operand)
+        right = constraint.right_operand
+        operator_name = constraint.operator.removeprefix("odrl:")
+        if operator_name == "isAnyOf":
+            return value == right
+        if isinstance(value, datetime):
+            right = datetime.fromisoformat(right.replace("Z", "+00:00"))
+        elif isinstance(value, (int, float)) and isinstance(right, str):
+            right = float(right)
+        return _NAIVE[operator_name](value, right)
+    if constraint.and_ is not None:
+        return all(naive_satisfied(child, context) for child in constraint.and_)
+    return any(naive_satisfied(child, context) for child in constraint.or_)
+
+
+def naive_permits(document: dict, context: dict) -> bool:
+    offer = ODRLOffer.model_validate(document)
+    return any(all(naive_satisfied(c, context) for c in permission.constraint or []) for permission in offer.permission)
+
+
+def timed(label: str, function, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = function()
+    elapsed = (time.perf_counter() - start) / iterations
+    print(f"{label:<32} {elapsed * 1e6:>10.2f} us")
+    return result
+
+
+def main(depth: int, fanout: int, iterations: int):
+    document = make_offer(depth, fanout)
+    print(f"Offer with {fanout ** depth} constraints, {depth} levels deep")
+
+    engine = PolicyEngine(cache_size=1000)
+    compiled = engine.compile(document)
+    expected = timed("pydantic validate + walk", lambda: naive_permits(document, CONTEXT), max(iterations // 100, 10))
+    timed("compile", lambda: PolicyEngine(cache_size=0).compile(document), max(iterations // 100, 10))
+    result = timed("evaluate, compiled", lambda: compiled.permits(CONTEXT), iterations)
+    timed("evaluate, engine cache", lambda: engine.evaluate(document, CONTEXT), max(iterations // 10, 10))
+    timed("evaluate, engine cache by hash", lambda: engine.evaluate(document, CONTEXT, digest=compiled.digest), iterations)
+    assert result == expected, (result, expected)
+    # "quantity" alone: 20 <= "100" holds as numbers, not as text
+    quantity = dict(document, **{"odrl:permission": [
+        {"odrl:action": "odrl:use", "odrl:constraint": [make_constraint(0, 1, len(LEFT_OPERANDS) - 1)]}
+    ]})
+    assert engine.compile(quantity).permits(CONTEXT) and naive_permits(quantity, CONTEXT)
+
+    denied = dict(CONTEXT, dateTime=CONTEXT["dateTime"] + timedelta(days=3650), spatial="CZE")
+    timed("evaluate denied, compiled", lambda: compiled.permits(denied), iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.depth, args.fanout, args.iterations)
@@ -0,0 +1,83 @@
+"""Throughput of Thing Description schema validation
+
+Run from app/src, with the service settings (.env) in place:
+
+    python -m benchmarks.bench_td_validation [--count 20000] [--properties 20] [--workers 4]
+
+Reports validated TDs per second on the event loop (one core) and through the
+process pool of TDValidator, for the given number of workers.
+"""
+import argparse
+import asyncio
+import os
+import time
+from core.td_validation import TDValidator, load_validator, validate_tds
+
+
+def make_td(index: int, properties: int) -> dict:
+    return {
+        "@context": ["https://www.w3.org/2022/wot/td/v1.1", {"saref": "https://w3id.org/saref#"}],
+        "id": f"urn:circ:bench:wot:{index}",
+        "@type": "saref:Sensor",
+        "title": f"Sensor {index}",
+        "description": "Benchmark Thing Description",
+        "securityDefinitions": {"basic_sc": {"scheme": "basic", "in": "header"}},
+        "security": "basic_sc",
+        "properties": {
+            f"property{p}": {
+                "type": "number",
+                "unit": "om:degree_Celsius",
+                "readOnly": True,
+                "observable": True,
+                "forms": [{"href": f"https://sensor-{index}.example/properties/{p}", "op": ["readproperty"]}],
+            }
+            for p in range(properties)
+        },
+        "actions": {
+            "reset": {"input": {"type": "object", "properties": {"hard": {"type": "boolean"}}},
+                      "forms": [{"href": f"https://sensor-{index}.example/actions/reset"}]},
+        },
+        "events": {
+            "overheating": {"data": {"type": "string"}, "forms": [{"href": f"https://sensor-{index}.example/events/overheating", "subprotocol": "sse"}]},
+        },
+    }
+
+
+def report(label: str, count: int, seconds: float, cores: int):
+    rate = count / seconds
+    print(f"{label:<28} {rate:>12,.0f} TD/s {rate / cores:>12,.0f} TD/s per core")
+
+
+async def main(count: int, properties: int, workers: int, batch_size: int):
+    tds = [make_td(i, properties) for i in range(count)]
+
+    start = time.perf_counter()
+    load_validator()
+    print(f"Schema compiled in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    errors = validate_tds(tds)
+    report("inline", count, time.perf_counter() - start, 1)
+    assert not any(errors), errors[0]
+
+    validator = TDValidator(True, workers, offload_bytes=0)
+    validator.start()
+    try:
+        # Warm up: spawn the workers and compile the schema in each of them
+        await validator.validate_many(tds[:workers])
+        start = time.perf_counter()
+        for i in range(0, count, batch_size):
+            await validator.validate_many(tds[i:i + batch_size])
+        report(f"pool, {workers} workers", count, time.perf_counter() - start, workers)
+    finally:
+        validator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--properties", type=int, default=20, help="Properties per TD")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=500, help="TDs per validate_many call, as in bulk uploads")
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.properties, args.workers, args.batch_size))
@@ -0,0 +1,125 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from persistance.models_catalog import CatalogResponse, Dataset as DatasetModel
+from persistance.tables import DATASET_DOCUMENT, Dataset
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_dataset(dataset_data: dict) -> bytes:
+    """Validate a dataset as a catalog entry and serialize it, raises ValidationError"""
+    return DatasetModel.model_validate(dataset_data).model_dump_json(by_alias=True).encode("utf-8")
+
+
+def validate_dataset(dataset_data: dict) -> Tuple[dict, bytes]:
+    """Validate a dataset to write, raises ValidationError
+
+    Returns the document to store, the members of the catalog models keyed by
+    their alias (`id` becomes `@id`) and the others kept, and its catalog entry
+    serialized.
+    """
+    dataset = DatasetModel.model_validate(dataset_data)
+    return _by_alias(dataset, dataset_data), dataset.model_dump_json(by_alias=True).encode("utf-8")
+
+
+def _by_alias(model: BaseModel, document: dict) -> dict:
+    fields = type(model).model_fields
+    aliases = {field.alias: name for name, field in fields.items() if field.alias}
+    normalized = {}
+    for key, value in document.items():
+        name = aliases.get(key, key)
+        if name not in fields:
+            normalized[key] = value
+        elif name == key and fields[name].alias in document:
+            # Both given, validation used the alias
+            continue
+        else:
+            normalized[fields[name].alias or name] = _value_by_alias(getattr(model, name), value)
+    return normalized
+
+
+def _value_by_alias(validated: Any, value: Any) -> Any:
+    if isinstance(validated, BaseModel) and isinstance(value, dict):
+        return _by_alias(validated, value)
+    if isinstance(validated, list) and isinstance(value, list):
+        return [_value_by_alias(item, raw) for item, raw in zip(validated, value)]
+    return value
+
+
+def catalog_header() -> dict:
+    """Catalog members other than the datasets, from the settings"""
+    return {
+        "@context": [settings.CATALOG_CONTEXT],
+        "@id": settings.CATALOG_ID,
+        "@type": "Catalog",
+        "participantId": settings.CATALOG_PARTICIPANT_ID,
+        "service": [
+            {
+                "@id": settings.CATALOG_SERVICE_ID,
+                "@type": "DataService",
+                "endpointURL": settings.CATALOG_ENDPOINT_URL,
+            }
+        ],
+    }
+
+
+class CatalogSnapshot:
+    """In-memory DSP catalog of the datasets table, kept as validated JSON bytes
+
+    Every dataset is validated and serialized once, when it is written through
+    persistance.crud_catalog or read from the change feed by core.catalog_sync,
+    and catalog pages are joins of those bytes. Entries carry the change_seq
+    they were read at and an older version never replaces a newer one, so
+    writes and the change feed can be applied in any order.
+    """
+
+    def __init__(self):
+        self._datasets: Dict[str, bytes] = {}
+        # change_seq of the latest version applied, deleted datasets included
+        self._versions: Dict[str, int] = {}
+        self._prefix: Optional[bytes] = None
+
+    async def get_subset(self, db: AsyncSession, dataset_ids: List[str]) -> bytes:
+        """Serialized catalog of the given datasets only, in the given order
+
+        Datasets missing from the snapshot, written by other workers since the
+        last sync, are read and added to it first.
+        """
+        missing = [dataset_id for dataset_id in dataset_ids if dataset_id not in self._datasets]
+        if missing:
+            result = await db.execute(
+                select(Dataset.id, Dataset.change_seq, DATASET_DOCUMENT).where(Dataset.id.in_(missing))
+            )
+            for dataset_id, change_seq, dataset_data in result.all():
+                try:
+                    self.upsert(dataset_id, serialize_dataset(dataset_data), change_seq)
+                except ValidationError as e:
+                    logger.error(f"Dataset {dataset_id} left out of the catalog: {e}")
+        selected = [dataset_id for dataset_id in dict.fromkeys(dataset_ids) if dataset_id in self._datasets]
+        return self.prefix() + b",".join(self._datasets[dataset_id] for dataset_id in selected) + b"]}"
+
+    def prefix(self) -> bytes:
+        """Serialized catalog up to its dataset array, validated once"""
+        if self._prefix is None:
+            header = CatalogResponse.model_validate(catalog_header()).model_dump(by_alias=True, mode="json")
+            header.pop("dataset")
+            self._prefix = json.dumps(header, separators=(",", ":"), ensure_ascii=False)[:-1].encode("utf-8") + b',"dataset":['
+        return self._prefix
+
+    def upsert(self, dataset_id: str, serialized: bytes, change_seq: int):
+        if self._versions.get(dataset_id, 0) < change_seq:
+            self._versions[dataset_id] = change_seq
+            self._datasets[dataset_id] = serialized
+
+    def remove(self, dataset_id: str, change_seq: int):
+        if self._versions.get(dataset_id, 0) < change_seq:
+            self._versions[dataset_id] = change_seq
+            self._datasets.pop(dataset_id, None)
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Any, List, Optional, Tuple
+from pydantic import ValidationError
+from core.catalog_snapshot import catalog_snapshot, serialize_dataset
+from core.policy_index import offer_policies, policy_index
+from persistance.crud_catalog import get_dataset_changes
+from persistance.database import AsyncSessionLocal
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _prepare_changes(changes: List[Tuple[int, str, Optional[Any]]]) -> List[Tuple[Optional[bytes], Optional[list]]]:
+    """Catalog entry and offers of each change, None for deletes and the entry of invalid datasets"""
+    prepared = []
+    for _, dataset_id, dataset_data in changes:
+        if dataset_data is None:
+            prepared.append((None, None))
+            continue
+        try:
+            serialized = serialize_dataset(dataset_data)
+        except ValidationError as e:
+            logger.error(f"Dataset {dataset_id} left out of the catalog: {e}")
+            serialized = None
+        prepared.append((serialized, offer_policies(dataset_data.get("hasPolicy"))))
+    return prepared
+
+
+class CatalogSync:
+    """Keeps the in-memory catalog and policy index of this worker up to date with the datasets table
+
+    Writes of this worker are applied by persistance.crud_catalog as they
+    commit. Every `interval_seconds` a background task reads the changes of
+    the other workers from the change feed (change_seq, tombstones included)
+    past the last one seen, `batch_size` at a time, so only the datasets
+    written since are validated again. The first sync reads the whole table,
+    batches are serialized and their offers hashed in a thread to keep the
+    event loop responsive.
+    """
+
+    def __init__(self, interval_seconds: float, batch_size: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.watermark = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog sync failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def sync(self):
+        """Apply the changes past the watermark"""
+        while True:
+            async with AsyncSessionLocal() as db:
+                changes = await get_dataset_changes(db, since=self.watermark, limit=self.batch_size)
+            if changes:
+                prepared = await asyncio.to_thread(_prepare_changes, changes)
+                for (change_seq, dataset_id, _), (entry, policies) in zip(changes, prepared):
+                    if entry is None:
+                        catalog_snapshot.remove(dataset_id, change_seq)
+                    else:
+                        catalog_snapshot.upsert(dataset_id, entry, change_seq)
+                    if policies is None:
+                        policy_index.remove(dataset_id, change_seq)
+                    else:
+                        policy_index.index(dataset_id, policies, change_seq)
+                self.watermark = changes[-1][0]
+            if len(changes) < self.batch_size:
+                policy_index.loaded()
+                return
+
+
+catalog_sync = CatalogSync(settings.CATALOG_SYNC_SECONDS, settings.CATALOG_SYNC_BATCH_SIZE)
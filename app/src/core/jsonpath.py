@@ -0,0 +1,281 @@
+import json
+import re
+from functools import lru_cache
+from utils.config import settings
+
+# Translation of RFC 9535 JSONPath (as used by WoT Discovery) into the SQL/JSON
+# path language understood by Postgres (`jsonb_path_query`, `@?`).
+# Wildcards and filters select the children of objects and arrays alike, which
+# Postgres expresses with the `.**{1}` accessor. Paths with descendant segments
+# (`..`) are evaluated in strict mode: in lax mode `.**` also unwraps the arrays
+# it walks through, so every array member would be selected twice.
+
+_NAME = re.compile(r"[A-Za-z_@\u0080-\uffff][A-Za-z0-9_\-@:\u0080-\uffff]*")
+_NUMBER = re.compile(r"-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+_INDEX = re.compile(r"-?[0-9]+")
+_COMPARISONS = ("==", "!=", "<=", ">=", "<", ">")
+_CHILDREN = ".**{1}"
+
+
+class JSONPathError(ValueError):
+    """Raised for malformed or unsupported JSONPath expressions"""
+
+
+@lru_cache(maxsize=settings.JSONPATH_CACHE_SIZE)
+def compile_jsonpath(expression: str) -> str:
+    """Validate a JSONPath expression and translate it to a Postgres jsonpath"""
+    if len(expression) > settings.JSONPATH_MAX_LENGTH:
+        raise JSONPathError("Expression is too long")
+    return _Parser(expression).parse()
+
+
+def _quote(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.descendants = False
+
+    def error(self, message: str) -> JSONPathError:
+        return JSONPathError(f"{message} at position {self.pos}")
+
+    def peek(self, size: int = 1) -> str:
+        return self.text[self.pos:self.pos + size]
+
+    def skip_ws(self):
+        while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n":
+            self.pos += 1
+
+    def expect(self, token: str):
+        self.skip_ws()
+        if not self.text.startswith(token, self.pos):
+            raise self.error(f"Expected '{token}'")
+        self.pos += len(token)
+
+    def parse(self) -> str:
+        self.skip_ws()
+        self.expect("$")
+        path = "$" + "".join(self.parse_segments())
+        self.skip_ws()
+        if self.pos != len(self.text):
+            raise self.error("Unexpected input")
+        return "strict " + path if self.descendants else path
+
+    def parse_segments(self) -> list:
+        segments = []
+        while True:
+            if self.peek(2) == "..":
+                self.pos += 2
+                self.descendants = True
+                if self.peek() == "*":
+                    self.pos += 1
+                    segments.append(".**{1 to last}")
+                elif self.peek() == "[":
+                    segments.append(".**" + self.parse_bracket())
+                else:
+                    segments.append(".**." + _quote(self.parse_name()))
+            elif self.peek() == ".":
+                self.pos += 1
+                if self.peek() == "*":
+                    self.pos += 1
+                    segments.append(_CHILDREN)
+                else:
+                    segments.append("." + _quote(self.parse_name()))
+            elif self.peek() == "[":
+                segments.append(self.parse_bracket())
+            else:
+                return segments
+
+    def parse_name(self) -> str:
+        match = _NAME.match(self.text, self.pos)
+        if not match:
+            raise self.error("Expected member name")
+        self.pos = match.end()
+        return match.group()
+
+    def parse_string(self) -> str:
+        quote = self.peek()
+        self.pos += 1
+        chars = []
+        while self.pos < len(self.text):
+            ch = self.text[self.pos]
+            self.pos += 1
+            if ch == quote:
+                try:
+                    return json.loads('"' + "".join(chars) + '"')
+                except ValueError:
+                    raise self.error("Invalid string literal")
+            if ch == "\\":
+                escaped = self.peek()
+                self.pos += 1
+                # Single quotes need no escaping in a JSON string
+                chars.append(escaped if escaped == "'" else "\\" + escaped)
+            elif ch == '"':
+                chars.append('\\"')
+            else:
+                chars.append(ch)
+        raise self.error("Unterminated string literal")
+
+    def parse_index(self) -> int:
+        match = _INDEX.match(self.text, self.pos)
+        if not match:
+            raise self.error("Expected array index")
+        self.pos = match.end()
+        return int(match.group())
+
+    @staticmethod
+    def index_expr(index: int, exclusive_end: bool = False) -> str:
+        if exclusive_end:
+            index -= 1
+        if index >= 0:
+            return str(index)
+        return "last" if index == -1 else f"last - {-index - 1}"
+
+    def parse_bracket(self) -> str:
+        self.expect("[")
+        self.skip_ws()
+        ch = self.peek()
+        if ch == "*":
+            self.pos += 1
+            self.expect("]")
+            return _CHILDREN
+        if ch == "?":
+            self.pos += 1
+            return f"{_CHILDREN} ? ({self.parse_filter()})"
+        if ch in ("'", '"'):
+            name = self.parse_string()
+            self.skip_ws()
+            if self.peek() == ",":
+                raise self.error("Multiple member names are not supported")
+            self.expect("]")
+            return "." + _quote(name)
+
+        subscripts = []
+        while True:
+            self.skip_ws()
+            start = self.parse_index() if self.peek() != ":" else 0
+            self.skip_ws()
+            if self.peek() == ":":
+                self.pos += 1
+                self.skip_ws()
+                end = self.parse_index() if self.peek() not in (":", "]", ",") else None
+                if self.peek() == ":":
+                    raise self.error("Slice steps are not supported")
+                end_expr = "last" if end is None else self.index_expr(end, exclusive_end=True)
+                subscripts.append(f"{self.index_expr(start)} to {end_expr}")
+            else:
+                subscripts.append(self.index_expr(start))
+            self.skip_ws()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return "[" + ", ".join(subscripts) + "]"
+
+    def parse_filter(self) -> str:
+        tokens = []
+        depth = 0
+        while True:
+            self.skip_ws()
+            ch = self.peek()
+            if not ch:
+                raise self.error("Unterminated filter")
+            if ch == "]" and depth == 0:
+                self.pos += 1
+                break
+            if ch in ("@", "$"):
+                self.pos += 1
+                tokens.append(("path", ch + "".join(self.parse_segments())))
+            elif ch in ("'", '"'):
+                tokens.append(("value", _quote(self.parse_string())))
+            elif ch == "(":
+                self.pos += 1
+                depth += 1
+                tokens.append(("(", "("))
+            elif ch == ")":
+                self.pos += 1
+                depth -= 1
+                if depth < 0:
+                    raise self.error("Unbalanced parenthesis")
+                tokens.append((")", ")"))
+            elif self.peek(2) in ("&&", "||"):
+                self.pos += 2
+                tokens.append(("logic", self.text[self.pos - 2:self.pos]))
+            elif self.peek(2) in _COMPARISONS or ch in _COMPARISONS:
+                op = self.peek(2) if self.peek(2) in _COMPARISONS else ch
+                self.pos += len(op)
+                tokens.append(("cmp", op))
+            elif ch == "!":
+                self.pos += 1
+                tokens.append(("not", "!"))
+            elif _NUMBER.match(self.text, self.pos):
+                match = _NUMBER.match(self.text, self.pos)
+                self.pos = match.end()
+                tokens.append(("value", match.group()))
+            else:
+                name = self.parse_name()
+                if name in ("true", "false", "null"):
+                    tokens.append(("value", name))
+                elif name in ("match", "search"):
+                    tokens.append(("test", self.parse_regex_function(name)))
+                else:
+                    raise self.error(f"Unsupported function or keyword '{name}'")
+        if depth:
+            raise self.error("Unbalanced parenthesis")
+        return self.translate_filter(tokens)
+
+    def parse_regex_function(self, name: str) -> str:
+        self.expect("(")
+        self.skip_ws()
+        if self.peek() not in ("@", "$"):
+            raise self.error(f"{name}() expects a path as first argument")
+        root = self.peek()
+        self.pos += 1
+        path = root + "".join(self.parse_segments())
+        self.expect(",")
+        self.skip_ws()
+        if self.peek() not in ("'", '"'):
+            raise self.error(f"{name}() expects a string pattern")
+        pattern = self.parse_string()
+        self.expect(")")
+        if name == "match":
+            pattern = f"^(?:{pattern})$"
+        return f"{path} like_regex {_quote(pattern)}"
+
+    def translate_filter(self, tokens: list) -> str:
+        if not tokens:
+            raise self.error("Empty filter")
+        out = []
+        expect_operand = True
+        for i, (kind, text) in enumerate(tokens):
+            previous = tokens[i - 1][0] if i else None
+            following = tokens[i + 1][0] if i + 1 < len(tokens) else None
+            if kind in ("path", "value", "test"):
+                if not expect_operand:
+                    raise self.error("Missing operator in filter")
+                if kind == "path" and "cmp" not in (previous, following):
+                    text = f"exists({text})"
+                elif kind == "value" and "cmp" not in (previous, following):
+                    raise self.error("Literal outside of a comparison")
+                # Postgres only accepts a parenthesized predicate after '!'
+                out.append(f"({text})" if previous == "not" else text)
+                expect_operand = False
+            elif kind in ("cmp", "logic"):
+                if expect_operand:
+                    raise self.error("Missing operand in filter")
+                out.append(text)
+                expect_operand = True
+            elif kind in ("not", "("):
+                if not expect_operand:
+                    raise self.error("Missing operator in filter")
+                out.append(text)
+            else:
+                if expect_operand:
+                    raise self.error("Missing operand in filter")
+                out.append(text)
+        if expect_operand:
+            raise self.error("Incomplete filter")
+        return " ".join(out)
@@ -0,0 +1,83 @@
+import uuid
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+from urllib.parse import quote
+from persistance.models import (
+    ContractAgreementMessage,
+    ContractNegotiationEventMessage,
+    ContractNegotiationState as State,
+    ContractOfferMessage,
+)
+from utils.config import settings
+
+# DSP contract negotiation state machine (Dataspace Protocol 2025-1).
+#
+#   consumer: ContractRequestMessage              -> REQUESTED
+#   provider: ContractOfferMessage                -> OFFERED
+#   consumer: ContractNegotiationEventMessage     -> ACCEPTED
+#   provider: ContractAgreementMessage            -> AGREED
+#   consumer: ContractAgreementVerificationMessage -> VERIFIED
+#   provider: ContractNegotiationEventMessage     -> FINALIZED
+#   either:   ContractNegotiationTerminationMessage -> TERMINATED
+#
+# A negotiation starts with a request of the consumer or an offer of the
+# provider (transitions from None). FINALIZED and TERMINATED are final.
+TRANSITIONS: Dict[Optional[State], FrozenSet[State]] = {
+    None: frozenset({State.REQUESTED, State.OFFERED}),
+    State.REQUESTED: frozenset({State.OFFERED, State.AGREED, State.TERMINATED}),
+    State.OFFERED: frozenset({State.REQUESTED, State.ACCEPTED, State.TERMINATED}),
+    State.ACCEPTED: frozenset({State.AGREED, State.TERMINATED}),
+    State.AGREED: frozenset({State.VERIFIED, State.TERMINATED}),
+    State.VERIFIED: frozenset({State.FINALIZED, State.TERMINATED}),
+    State.FINALIZED: frozenset(),
+    State.TERMINATED: frozenset(),
+}
+
+
+class NegotiationError(ValueError):
+    """Message not allowed in the state of the negotiation"""
+
+
+class NegotiationConflict(Exception):
+    """Negotiation changed by a concurrent message since it was read"""
+
+
+def check_transition(current: Optional[str], target: State) -> State:
+    """Validate a transition of the state graph, `current` being None for a new negotiation"""
+    state = State(current) if current is not None else None
+    if target not in TRANSITIONS[state]:
+        raise NegotiationError(f"Negotiation cannot go from {state.value if state else 'start'} to {target.value}")
+    return target
+
+
+# Messages of the provider, posted to `<callbackAddress>/negotiations/<consumerPid><path>`
+CALLBACK_MESSAGES = {
+    State.OFFERED: (ContractOfferMessage, "/offers"),
+    State.AGREED: (ContractAgreementMessage, "/agreement"),
+    State.FINALIZED: (ContractNegotiationEventMessage, "/events"),
+}
+
+
+def callback_message(negotiation: Any) -> Optional[Tuple[str, dict]]:
+    """`(target, message)` telling the consumer about the state a negotiation reached
+
+    None for states reached by messages of the consumer.
+    """
+    state = State(negotiation.state)
+    if state not in CALLBACK_MESSAGES:
+        return None
+    model, path = CALLBACK_MESSAGES[state]
+    document = {
+        "@context": [settings.CATALOG_CONTEXT],
+        "@id": f"urn:uuid:{uuid.uuid4()}",
+        "dspace:consumerPid": negotiation.consumer_pid,
+        "dspace:providerPid": negotiation.provider_pid,
+    }
+    if state == State.OFFERED:
+        document.update({"dspace:offer": negotiation.offer, "dspace:callbackAddress": settings.CATALOG_ENDPOINT_URL})
+    elif state == State.AGREED:
+        document["dspace:agreement"] = negotiation.agreement
+    else:
+        document["dspace:eventType"] = state.value
+    message = model.model_validate(document).model_dump(mode="json", by_alias=True, exclude_none=True)
+    target = f"{negotiation.callback_address.rstrip('/')}/negotiations/{quote(negotiation.consumer_pid, safe='')}{path}"
+    return target, message
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Set
+import asyncpg
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+TD_CHANNEL = "td_changes"
+
+# ThingDescriptionCRUD mutation -> WoT Discovery notification type
+EVENT_TYPES = {
+    "create": "thing_created",
+    "update": "thing_updated",
+    "delete": "thing_deleted",
+}
+# Sent to every subscriber when notifications may have been missed
+RESYNC = "resync"
+
+
+class ChangeEvent(NamedTuple):
+    id: str
+    type: str
+    data: str
+    seq: int
+
+
+class Subscription:
+    """Bounded event buffer of a single SSE client"""
+
+    def __init__(self, buffer_size: int, types: Optional[Set[str]] = None):
+        self.queue: "asyncio.Queue[ChangeEvent]" = asyncio.Queue(maxsize=buffer_size)
+        self.types = types
+        self.overflowed = False
+
+    def push(self, event: ChangeEvent) -> bool:
+        if self.types and event.type not in self.types and event.type != RESYNC:
+            return True
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+
+
+class ChangeFeed:
+    """Fan-out of Thing Description changes published with Postgres NOTIFY
+
+    A single LISTEN connection serves every subscriber. Events get ids
+    `<epoch>-<seq>`, the latest ones are kept so that clients can resume from
+    Last-Event-ID after a reconnect. A subscriber that falls behind its buffer is
+    dropped and resumes the same way.
+
+    Notifications sent while the LISTEN connection is down are lost. Once it is
+    back, a new epoch starts: the history is dropped and subscribers get a
+    `resync` event telling them to list the directory again.
+    """
+
+    def __init__(self, channel: str, buffer_size: int, history_size: int):
+        self.channel = channel
+        self.buffer_size = buffer_size
+        self.epoch = str(int(time.time()))
+        self._seq = 0
+        self._history: Deque[ChangeEvent] = deque(maxlen=history_size)
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        delay = 1
+        listened = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                logger.info(f"Listening for changes on {self.channel}")
+                if listened:
+                    self.resync()
+                listened = True
+                delay = 1
+                await closed.wait()
+                logger.warning("Change feed connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change feed listener failed: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        try:
+            change = json.loads(payload)
+            event_type = EVENT_TYPES[change.pop("type")]
+        except (ValueError, KeyError) as e:
+            logger.error(f"Invalid change notification {payload!r}: {e}")
+            return
+        self.publish(event_type, change)
+
+    def publish(self, event_type: str, data: dict):
+        self._seq += 1
+        event = ChangeEvent(f"{self.epoch}-{self._seq}", event_type, json.dumps(data), self._seq)
+        self._history.append(event)
+        for subscription in list(self._subscribers):
+            if not subscription.push(event):
+                self._subscribers.discard(subscription)
+
+    def resync(self):
+        """Start a new epoch, the events published so far cannot be resumed from"""
+        self.epoch = str(max(int(time.time()), int(self.epoch) + 1))
+        self._seq = 0
+        self._history.clear()
+        event = ChangeEvent(f"{self.epoch}-0", RESYNC, "{}", 0)
+        for subscription in list(self._subscribers):
+            if not subscription.push(event):
+                self._subscribers.discard(subscription)
+
+    def subscribe(self, last_event_id: Optional[str] = None, types: Optional[Set[str]] = None) -> Subscription:
+        """Register a subscriber, replaying the events after `last_event_id`"""
+        subscription = Subscription(self.buffer_size, types)
+        for event in self.missed_events(last_event_id):
+            if not subscription.push(event):
+                break
+        if not subscription.overflowed:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def missed_events(self, last_event_id: Optional[str]) -> List[ChangeEvent]:
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            raise LookupError("Unknown Last-Event-ID")
+        seq = int(seq)
+        if self._history and seq < self._history[0].seq - 1:
+            raise LookupError("Last-Event-ID is too old")
+        return [event for event in self._history if event.seq > seq]
+
+
+change_feed = ChangeFeed(TD_CHANNEL, settings.SSE_BUFFER_SIZE, settings.SSE_HISTORY_SIZE)
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+import httpx
+from persistance.database import AsyncSessionLocal
+from persistance.outbox import claim_messages, record_deliveries, renew_leases
+from utils.config import settings
+from utils.fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+# Responses worth another attempt, other 4xx are final
+RETRY_STATUSES = {408, 425, 429}
+
+
+class OutboxDispatcher:
+    """Background delivery of the outbox messages to counterparties
+
+    Request handlers only write messages to outbox_messages, in the
+    transaction of the state change, and wake the dispatcher, so their latency
+    does not depend on the peers. The dispatcher claims due messages in
+    batches (FOR UPDATE SKIP LOCKED, several workers share the table), posts
+    them with a pooled httpx.AsyncClient, at most `host_concurrency` at a time
+    per host, and deletes the delivered ones in batches. Failed deliveries are
+    retried with exponential backoff and jitter until `max_attempts`.
+
+    Delivery is at least once: a message claimed by a worker that crashes is
+    sent again when its lease expires. Messages wait for a slot of their host
+    after being claimed, the worker renews the leases of the messages it holds
+    every third of `lease_seconds` until their outcome is written, so a queue
+    longer than the lease does not get them claimed and sent twice.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_in_flight: int,
+        host_concurrency: int,
+        timeout_seconds: float,
+        poll_seconds: float,
+        lease_seconds: float,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+        max_attempts: int,
+    ):
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.host_concurrency = host_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_attempts = max_attempts
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._in_flight: Set[asyncio.Task] = set()
+        # Concurrency limit of each host with messages in flight, and their number
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+        # Claimed messages whose outcome is not written yet, their leases are renewed
+        self._held: Set[int] = set()
+        self._renew_at = 0.0
+        # Outcomes waiting to be written, in a batch
+        self._delivered: List[int] = []
+        self._failed: List[Dict[str, Any]] = []
+
+    async def start(self):
+        if self._task is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=100),
+            )
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Interrupted messages are sent again once their lease expires
+        for task in list(self._in_flight):
+            task.cancel()
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+        try:
+            await self._flush()
+        except Exception as e:
+            logger.error(f"Outbox results could not be saved: {e}")
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def wake(self):
+        """Deliver newly committed messages without waiting for the next poll"""
+        self._wakeup.set()
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                await self._flush()
+                await self._renew()
+                claimed = await self._claim()
+                delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox dispatcher failed: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            if claimed == self.batch_size:
+                continue
+            timeout = self.poll_seconds
+            if self._held:
+                timeout = min(timeout, max(self._renew_at - time.monotonic(), 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> int:
+        limit = min(self.batch_size, self.max_in_flight - len(self._in_flight))
+        if limit <= 0:
+            return 0
+        async with AsyncSessionLocal() as db:
+            messages = await claim_messages(db, limit, self.lease_seconds, exclude=self._held)
+        if messages and not self._held:
+            self._renew_at = time.monotonic() + self.lease_seconds / 3
+        for message in messages:
+            self._held.add(message.id)
+            task = asyncio.create_task(self._deliver(message.id, message.target, message.message, message.attempts))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+        return len(messages)
+
+    async def _flush(self):
+        if not self._delivered and not self._failed:
+            return
+        delivered, failed = self._delivered, self._failed
+        self._delivered, self._failed = [], []
+        try:
+            async with AsyncSessionLocal() as db:
+                await record_deliveries(db, delivered, failed)
+        except Exception:
+            self._delivered = delivered + self._delivered
+            self._failed = failed + self._failed
+            raise
+        self._held.difference_update(delivered)
+        self._held.difference_update(item["id"] for item in failed)
+
+    async def _renew(self):
+        if not self._held or time.monotonic() < self._renew_at:
+            return
+        async with AsyncSessionLocal() as db:
+            await renew_leases(db, self._held, self.lease_seconds)
+        self._renew_at = time.monotonic() + self.lease_seconds / 3
+
+    async def _deliver(self, message_id: int, target: str, message: dict, attempts: int):
+        host = urlsplit(target).netloc
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = self._hosts[host] = asyncio.Semaphore(self.host_concurrency)
+        self._host_users[host] = self._host_users.get(host, 0) + 1
+        retry_after = None
+        try:
+            async with semaphore:
+                response = await self._client.post(
+                    target, content=dumps(message), headers={"Content-Type": "application/json"}
+                )
+            if response.is_success:
+                self._delivered.append(message_id)
+                self.wake()
+                return
+            error = f"HTTP {response.status_code}"
+            retry = response.status_code in RETRY_STATUSES or response.status_code >= 500
+            retry_after = response.headers.get("Retry-After")
+        except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+            error = f"{type(e).__name__}: {e}"
+            retry = False
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+            retry = True
+        finally:
+            self._release_host(host)
+        next_attempt_at = None
+        if retry and attempts < self.max_attempts:
+            next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=self._backoff(attempts, retry_after))
+        else:
+            logger.error(f"Outbox message {message_id} to {target} given up after {attempts} attempts: {error}")
+        self._failed.append({"id": message_id, "next_attempt_at": next_attempt_at, "last_error": error})
+        self.wake()
+
+    def _release_host(self, host: str):
+        # Hosts without messages in flight are forgotten, counterparties come and go
+        users = self._host_users.pop(host) - 1
+        if users:
+            self._host_users[host] = users
+        else:
+            del self._hosts[host]
+
+    def _backoff(self, attempts: int, retry_after: Optional[str] = None) -> float:
+        delay = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+        # Jitter spreads the retries of messages that failed together
+        delay *= random.uniform(0.5, 1)
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, min(int(retry_after), self.max_backoff_seconds))
+        return delay
+
+
+outbox_dispatcher = OutboxDispatcher(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    max_in_flight=settings.OUTBOX_MAX_IN_FLIGHT,
+    host_concurrency=settings.OUTBOX_HOST_CONCURRENCY,
+    timeout_seconds=settings.OUTBOX_TIMEOUT_SECONDS,
+    poll_seconds=settings.OUTBOX_POLL_SECONDS,
+    lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    backoff_seconds=settings.OUTBOX_BACKOFF_SECONDS,
+    max_backoff_seconds=settings.OUTBOX_MAX_BACKOFF_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+)
@@ -0,0 +1,396 @@
+import hashlib
+import json
+import operator
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, FrozenSet, List, Mapping, Optional, Tuple
+from pydantic import BaseModel
+from utils.config import settings
+
+# ODRL policy engine. An Offer or Agreement (pydantic model or JSON-LD dict,
+# with or without the `odrl:` prefix) is compiled once into closures: right
+# operands are parsed and typed at compile time, nested logical constraints of
+# the same kind are flattened, and and/or/xone short-circuit. Evaluation then
+# only reads the request context, e.g.
+#
+#   policy_engine.evaluate(offer, {"spatial": "SVK", "dateTime": now}, action="use")
+
+Context = Mapping[str, Any]
+Predicate = Callable[[Context], bool]
+
+ODRL_PREFIXES = ("odrl:", "http://www.w3.org/ns/odrl/2/")
+# Every action is a narrower form of odrl:use
+USE = "use"
+LOGICAL_OPERATORS = ("and", "or", "xone", "andSequence")
+DATETIME_TYPES = ("dateTime", "date", "dateTimeStamp")
+NUMBER_TYPES = ("decimal", "integer", "double", "float", "int", "long")
+# Untyped right operands spelled as numbers, e.g. "100" in catalog offers
+NUMERIC = re.compile(r"[-+]?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+
+_MISSING = object()
+
+_COMPARISONS = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "gteq": operator.ge,
+    "lt": operator.lt,
+    "lteq": operator.le,
+    "isA": operator.eq,
+}
+
+
+class PolicyError(ValueError):
+    """Policy that cannot be compiled"""
+
+
+def _plain(term: str) -> str:
+    for prefix in ODRL_PREFIXES:
+        if term.startswith(prefix):
+            return term[len(prefix):]
+    return term
+
+
+def term(value: Any) -> Any:
+    """IRI or name of a term given as a string, a {"@id": ...} node or an ODRLAction"""
+    if isinstance(value, dict):
+        value = value.get("@id") or value.get("value") or value.get("action")
+    return _plain(value) if isinstance(value, str) else value
+
+
+def normalize(policy: Any) -> dict:
+    """Policy as a dict with the ODRL prefixes removed from its keys"""
+    if isinstance(policy, BaseModel):
+        policy = policy.model_dump(by_alias=True, exclude_none=True, mode="json")
+    if isinstance(policy, dict):
+        return {_plain(key): normalize(value) for key, value in policy.items()}
+    if isinstance(policy, list):
+        return [normalize(item) for item in policy]
+    return policy
+
+
+def policy_hash(document: dict) -> str:
+    canonical = json.dumps(document, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _as_datetime(value: Any) -> datetime:
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _as_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError("Not a number")
+    return value if isinstance(value, (int, float)) else float(value)
+
+
+def _as_string(value: Any) -> str:
+    return term(value) if isinstance(value, dict) else str(value)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _parse_operand(value: Any, data_type: Optional[str]) -> Tuple[Any, Callable[[Any], Any]]:
+    """Right operand value and the conversion applied to left operand values"""
+    data_type = data_type.rsplit("#", 1)[-1].rsplit(":", 1)[-1] if data_type else None
+    if isinstance(value, bool):
+        return value, _identity
+    numeric = data_type is None and isinstance(value, str) and NUMERIC.fullmatch(value.strip()) is not None
+    if isinstance(value, (int, float)) or data_type in NUMBER_TYPES or numeric:
+        try:
+            return _as_number(value), _as_number
+        except (TypeError, ValueError):
+            raise PolicyError(f"Invalid number: {value}")
+    if isinstance(value, dict):
+        value = term(value)
+    if data_type in DATETIME_TYPES or (isinstance(value, str) and len(value) >= 10 and value[4:5] == "-" and value[7:8] == "-"):
+        try:
+            return _as_datetime(value), _as_datetime
+        except ValueError:
+            if data_type in DATETIME_TYPES:
+                raise PolicyError(f"Invalid dateTime: {value}")
+    return _plain(value) if isinstance(value, str) else value, _as_string
+
+
+def _as_collection(value: Any, convert: Callable[[Any], Any]) -> FrozenSet:
+    items = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+    return frozenset(convert(item) for item in items)
+
+
+def _compile_constraint(constraint: dict, unknown: bool = False) -> Predicate:
+    """Predicate of an atomic constraint, `unknown` when the context cannot tell
+
+    The context cannot tell when the left operand is missing or its value
+    cannot be compared. Prohibitions are compiled with `unknown` True so that
+    they apply rather than let the request through.
+    """
+    left = term(constraint.get("leftOperand"))
+    operator_name = term(constraint.get("operator"))
+    right = constraint.get("rightOperand", constraint.get("rightOperandReference"))
+    data_type = constraint.get("dataType")
+    if isinstance(right, dict) and "@value" in right:
+        right, data_type = right["@value"], right.get("@type", data_type)
+    if not isinstance(left, str) or not isinstance(operator_name, str) or right is None:
+        raise PolicyError(f"Incomplete constraint: {constraint}")
+
+    if operator_name in ("isAnyOf", "isNoneOf", "isAllOf", "isPartOf"):
+        items = right if isinstance(right, list) else [right]
+        if not items:
+            raise PolicyError(f"Empty right operand: {constraint}")
+        parsed = [_parse_operand(item, data_type) for item in items]
+        if len({convert for _, convert in parsed}) > 1:
+            # Mixed lists, e.g. ["1", "a"], compare as strings
+            parsed = [(_as_string(item), _as_string) for item in items]
+        convert = parsed[0][1]
+        operand = frozenset(value for value, _ in parsed)
+        if operator_name == "isAllOf":
+            compare = lambda value: operand <= _as_collection(value, convert)
+        elif operator_name == "isNoneOf":
+            compare = lambda value: operand.isdisjoint(_as_collection(value, convert))
+        else:
+            compare = lambda value: not operand.isdisjoint(_as_collection(value, convert))
+    elif operator_name == "hasPart":
+        operand, convert = _parse_operand(right, data_type)
+        compare = lambda value: operand in _as_collection(value, convert) if not isinstance(value, str) else operand in value
+    elif operator_name in _COMPARISONS:
+        operand, convert = _parse_operand(right, data_type)
+        function = _COMPARISONS[operator_name]
+        compare = lambda value: function(convert(value), operand)
+    else:
+        raise PolicyError(f"Unsupported operator: {operator_name}")
+
+    def predicate(context: Context) -> bool:
+        value = context.get(left, _MISSING)
+        if value is _MISSING:
+            return unknown
+        try:
+            return compare(value)
+        except (TypeError, ValueError):
+            return unknown
+
+    return predicate
+
+
+def _all(predicates: List[Predicate]) -> Predicate:
+    if len(predicates) == 1:
+        return predicates[0]
+
+    def predicate(context: Context) -> bool:
+        for child in predicates:
+            if not child(context):
+                return False
+        return True
+
+    return predicate
+
+
+def _any(predicates: List[Predicate]) -> Predicate:
+    if len(predicates) == 1:
+        return predicates[0]
+
+    def predicate(context: Context) -> bool:
+        for child in predicates:
+            if child(context):
+                return True
+        return False
+
+    return predicate
+
+
+def _exactly_one(predicates: List[Predicate]) -> Predicate:
+    def predicate(context: Context) -> bool:
+        found = False
+        for child in predicates:
+            if child(context):
+                if found:
+                    return False
+                found = True
+        return found
+
+    return predicate
+
+
+def _operands(kind: str, constraints: List[dict]) -> List[dict]:
+    """Operands of a logical constraint, with nested constraints of the same kind inlined"""
+    flat = []
+    for constraint in constraints:
+        nested = _logical(constraint)
+        if nested is not None and nested[0] == kind and kind in ("and", "or"):
+            flat += _operands(kind, nested[1])
+        else:
+            flat.append(constraint)
+    return flat
+
+
+def _logical(constraint: dict) -> Optional[Tuple[str, List[dict]]]:
+    for kind in LOGICAL_OPERATORS:
+        operands = constraint.get(kind)
+        if operands is not None:
+            if isinstance(operands, dict):
+                operands = operands.get("@list", [operands])
+            return ("and" if kind == "andSequence" else kind), operands
+    return None
+
+
+def _compile_node(constraint: Any, unknown: bool = False) -> Predicate:
+    if not isinstance(constraint, dict):
+        raise PolicyError(f"Invalid constraint: {constraint}")
+    logical = _logical(constraint)
+    if logical is None:
+        return _compile_constraint(constraint, unknown)
+    kind, operands = logical
+    if not operands:
+        raise PolicyError(f"Empty logical constraint: {constraint}")
+    predicates = [_compile_node(operand, unknown) for operand in _operands(kind, operands)]
+    if kind == "and":
+        return _all(predicates)
+    if kind == "or":
+        return _any(predicates)
+    return _exactly_one(predicates)
+
+
+def _always(context: Context) -> bool:
+    return True
+
+
+def _compile_constraints(constraints: Any, unknown: bool) -> Optional[Predicate]:
+    """Conjunction of a constraint or refinement list, None when it is empty"""
+    if isinstance(constraints, dict):
+        constraints = [constraints]
+    if not constraints:
+        return None
+    return _all([_compile_node(constraint, unknown) for constraint in _operands("and", constraints)])
+
+
+def _compile_rule(rule: dict, unknown: bool = False) -> List[Tuple[FrozenSet[str], Predicate]]:
+    """`(actions, predicate)` of a rule, one more per action with a refinement
+
+    A refined action (`{"action": ..., "refinement": [...]}`) only matches
+    when its refinement holds too, with the rule constraints.
+    """
+    actions = rule.get("action")
+    actions = actions if isinstance(actions, list) else [actions]
+    constraints = _compile_constraints(rule.get("constraint"), unknown)
+    plain, compiled = set(), []
+    for action in actions:
+        name = term(action)
+        if not name:
+            continue
+        refinement = action.get("refinement") if isinstance(action, dict) else None
+        if refinement is None:
+            plain.add(name)
+            continue
+        refined = _compile_constraints(refinement, unknown)
+        if refined is None:
+            raise PolicyError(f"Empty refinement: {action}")
+        compiled.append((frozenset((name,)), _all([constraints, refined]) if constraints else refined))
+    if not plain and not compiled:
+        raise PolicyError(f"Rule without action: {rule}")
+    if plain:
+        compiled.insert(0, (frozenset(plain), constraints or _always))
+    return compiled
+
+
+class CompiledPolicy:
+    """ODRL Offer or Agreement compiled to predicates over a request context
+
+    A request is permitted when a permission covers the action with its
+    constraints satisfied and no prohibition of the action applies. A
+    prohibition whose constraints the context cannot evaluate applies. Duties
+    are not evaluated, they are obligations of the agreement rather than
+    conditions of access.
+    """
+
+    __slots__ = ("policy_id", "digest", "assignee", "permissions", "prohibitions", "actions")
+
+    def __init__(self, document: dict, digest: str):
+        self.policy_id = document.get("@id")
+        self.digest = digest
+        self.assignee = term(document.get("assignee"))
+        self.permissions = tuple(
+            compiled for rule in _rules(document, "permission") for compiled in _compile_rule(rule)
+        )
+        # A prohibition the context cannot rule out applies
+        self.prohibitions = tuple(
+            compiled for rule in _rules(document, "prohibition") for compiled in _compile_rule(rule, unknown=True)
+        )
+        self.actions = frozenset(action for actions, _ in self.permissions for action in actions)
+
+    def permits(self, context: Context, action: str = USE, participant: Optional[str] = None) -> bool:
+        if self.assignee is not None and participant != self.assignee:
+            return False
+        for actions, predicate in self.prohibitions:
+            if (action in actions or USE in actions) and predicate(context):
+                return False
+        for actions, predicate in self.permissions:
+            if (action in actions or USE in actions) and predicate(context):
+                return True
+        return False
+
+    def permits_any(self, context: Context, participant: Optional[str] = None) -> bool:
+        """Whether one of the actions of the permissions is permitted"""
+        return any(self.permits(context, action, participant) for action in self.actions)
+
+
+def _rules(document: dict, kind: str) -> List[dict]:
+    rules = document.get(kind) or []
+    return [rules] if isinstance(rules, dict) else rules
+
+
+class PolicyEngine:
+    """Compiles ODRL policies once, keeping them in an LRU cache by @id and content hash"""
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[Optional[str], str], CompiledPolicy]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, policy: Any, digest: Optional[str] = None) -> CompiledPolicy:
+        """Compiled form of a policy, raises PolicyError
+
+        `digest` is the policy_hash of the policy when the caller already knows
+        it, which saves hashing the document on every lookup.
+        """
+        if isinstance(policy, BaseModel):
+            policy = policy.model_dump(by_alias=True, exclude_none=True, mode="json")
+        if not isinstance(policy, dict):
+            raise PolicyError("A policy must be an object")
+        digest = digest or policy_hash(policy)
+        key = (policy.get("@id"), digest)
+        compiled = self._cache.get(key)
+        if compiled is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return compiled
+        self.misses += 1
+        compiled = CompiledPolicy(normalize(policy), digest)
+        if self.cache_size > 0:
+            self._cache[key] = compiled
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def evaluate(
+        self,
+        policy: Any,
+        context: Context,
+        action: str = USE,
+        participant: Optional[str] = None,
+        digest: Optional[str] = None,
+    ) -> bool:
+        return self.compile(policy, digest).permits(context, _plain(action), participant)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "max_entries": self.cache_size, "hits": self.hits, "misses": self.misses}
+
+
+policy_engine = PolicyEngine(settings.POLICY_CACHE_SIZE)
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from core.policy import NUMERIC, CompiledPolicy, Context, PolicyError, normalize, policy_engine, term
+from persistance.policies import offer_hash, policy_terms
+
+logger = logging.getLogger(__name__)
+
+Atom = Tuple[str, str, str]
+
+RESULT_CACHE_SIZE = 256
+
+
+def required_atoms(offer: dict) -> Set[Atom]:
+    """`(leftOperand, "eq", rightOperand)` string constraints every permission of `offer` requires
+
+    Only constraints at the top of a permission or under nested `and` are
+    required. A context without one of them cannot satisfy the offer. Like
+    core.policy, right operands spelled as numbers or dates are not compared
+    as strings, nor are the ordering operators, so they are left out.
+    """
+    required = None
+    for permission in _as_list(normalize(offer).get("permission")):
+        atoms = set()
+        for constraint in _conjuncts(_as_list(permission.get("constraint"))):
+            if "dataType" in constraint:
+                continue
+            left, operator_name, right = (term(constraint.get(key)) for key in ("leftOperand", "operator", "rightOperand"))
+            if operator_name != "eq" or not isinstance(left, str) or not isinstance(right, str):
+                continue
+            if NUMERIC.fullmatch(right.strip()) is None and not _looks_like_date(right):
+                atoms.add((left, operator_name, right))
+        required = atoms if required is None else required & atoms
+    return required or set()
+
+
+def _conjuncts(constraints: List[Any]) -> Iterable[dict]:
+    for constraint in constraints:
+        if not isinstance(constraint, dict):
+            continue
+        if "and" in constraint:
+            yield from _conjuncts(_as_list(constraint["and"]))
+        elif "leftOperand" in constraint:
+            yield constraint
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _looks_like_date(value: str) -> bool:
+    # Compared as dateTime by core.policy, not as strings
+    return len(value) >= 10 and value[4:5] == "-" and value[7:8] == "-"
+
+
+def offer_policies(offers: Any) -> List[Tuple[str, dict]]:
+    """`(hash, policy)` of the `hasPolicy` offers of a dataset, as stored in the policies table"""
+    policies = []
+    for offer in _as_list(offers):
+        if isinstance(offer, dict):
+            policy = policy_terms(offer)
+            policies.append((offer_hash(offer), policy))
+    return policies
+
+
+class PolicyIndex:
+    """Reverse index of the dataset offers, to list the datasets a participant can use
+
+    Offers (`hasPolicy`) are interned by the hash of their content without
+    their @id, as in the policies table, and compiled once, with the datasets
+    carrying each of them. Offers are also indexed by the
+    `leftOperand eq rightOperand` constraints they require (e.g. `spatial eq
+    SVK`), so those a context cannot satisfy are ruled out with set operations
+    and only the remaining distinct offers are evaluated. Datasets without
+    offers are visible to everyone.
+
+    Like core.catalog_snapshot, the index is kept up to date by the writes of
+    persistance.crud_catalog and by core.catalog_sync for the writes of other
+    workers, an older change_seq of a dataset never replaces a newer one.
+    Partitions wait for the first sync rather than list an incomplete index.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[str, Optional[CompiledPolicy]] = {}
+        self._datasets: Dict[str, Set[str]] = {}
+        self._offers: Dict[str, Tuple[str, ...]] = {}
+        # change_seq of the latest version indexed, deleted datasets included
+        self._versions: Dict[str, int] = {}
+        self._atoms: Dict[Atom, Set[str]] = {}
+        self._operands: Dict[str, Set[str]] = {}
+        self._unrestricted: Set[str] = set()
+        # Partitions of recent contexts, dropped on every change
+        self._results: "OrderedDict[str, Tuple[Set[str], Set[str]]]" = OrderedDict()
+        self._loaded = asyncio.Event()
+
+    async def partition(
+        self, context: Context, participant: Optional[str] = None, action: Optional[str] = None
+    ) -> Tuple[Set[str], Set[str]]:
+        """Ids of the datasets the context can and cannot use, the sets must not be modified
+
+        A dataset is visible when one of its offers permits `action`, or any
+        action when none is given.
+        """
+        await self._loaded.wait()
+        action = term(action)
+        key = json.dumps([participant, action, context], sort_keys=True, default=str)
+        cached = self._results.get(key)
+        if cached is not None:
+            self._results.move_to_end(key)
+            return cached
+        excluded = set()
+        for left, offers in self._operands.items():
+            value = context.get(left)
+            if not isinstance(value, str):
+                continue
+            excluded |= offers - self._atoms.get((left, "eq", value), set())
+        visible, hidden = set(self._unrestricted), set()
+        for digest, dataset_ids in self._datasets.items():
+            compiled = self._compiled.get(digest)
+            if digest not in excluded and compiled is not None and _permits(compiled, context, action, participant):
+                visible |= dataset_ids
+            else:
+                hidden |= dataset_ids
+        # A dataset with one satisfiable offer is visible
+        partition = visible, hidden - visible
+        self._results[key] = partition
+        while len(self._results) > RESULT_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return partition
+
+    def loaded(self):
+        """Called once every dataset has been indexed"""
+        if not self._loaded.is_set():
+            self._loaded.set()
+            logger.info(f"Policy index loaded with {len(self._versions)} datasets and {len(self._compiled)} distinct offers")
+
+    def upsert(self, dataset_id: str, offers: Any, change_seq: int):
+        """Index the `hasPolicy` offers of a dataset, replacing its previous ones"""
+        self.index(dataset_id, offer_policies(offers), change_seq)
+
+    def index(self, dataset_id: str, policies: List[Tuple[str, Optional[dict]]], change_seq: int):
+        """Index the offers of a dataset given as `(hash, policy)`, see offer_policies"""
+        if self._versions.get(dataset_id, 0) >= change_seq:
+            return
+        self._versions[dataset_id] = change_seq
+        self._drop(dataset_id)
+        if not policies:
+            self._unrestricted.add(dataset_id)
+            return
+        for digest, policy in policies:
+            if digest not in self._compiled:
+                self._intern(digest, policy)
+            self._datasets.setdefault(digest, set()).add(dataset_id)
+        self._offers[dataset_id] = tuple(digest for digest, _ in policies)
+
+    def remove(self, dataset_id: str, change_seq: int):
+        if self._versions.get(dataset_id, 0) >= change_seq:
+            return
+        self._versions[dataset_id] = change_seq
+        self._drop(dataset_id)
+
+    def _drop(self, dataset_id: str):
+        self._results.clear()
+        self._unrestricted.discard(dataset_id)
+        for digest in self._offers.pop(dataset_id, ()):
+            dataset_ids = self._datasets.get(digest)
+            if dataset_ids is None:
+                continue
+            dataset_ids.discard(dataset_id)
+            if not dataset_ids:
+                self._forget(digest)
+
+    def _intern(self, digest: str, offer: Optional[dict]):
+        try:
+            self._compiled[digest] = policy_engine.compile(offer, digest)
+        except PolicyError as e:
+            # Kept, so that its datasets stay hidden
+            logger.error(f"Policy {digest} cannot be evaluated: {e}")
+            self._compiled[digest] = None
+            return
+        for atom in required_atoms(offer):
+            self._atoms.setdefault(atom, set()).add(digest)
+            self._operands.setdefault(atom[0], set()).add(digest)
+
+    def _forget(self, digest: str):
+        del self._datasets[digest]
+        self._compiled.pop(digest, None)
+        for atom in [atom for atom, digests in self._atoms.items() if digest in digests]:
+            self._atoms[atom].discard(digest)
+            if not self._atoms[atom]:
+                del self._atoms[atom]
+            offers = self._operands.get(atom[0])
+            if offers is not None:
+                offers.discard(digest)
+                if not offers:
+                    del self._operands[atom[0]]
+
+
+def _permits(compiled: CompiledPolicy, context: Context, action: Optional[str], participant: Optional[str]) -> bool:
+    if action is None:
+        return compiled.permits_any(context, participant)
+    return compiled.permits(context, action, participant)
+
+
+policy_index = PolicyIndex()
@@ -0,0 +1,103 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from utils.config import settings
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    oid: uuid.UUID
+    expires: float
+
+
+class ResponseCache:
+    """Bounded LRU cache with TTL of serialized Thing Description responses
+
+    Entries are keyed by id, with a secondary oid -> id index. The cache is local
+    to the process, writes through ThingDescriptionCRUD invalidate it and the TTL
+    bounds staleness towards writes served by other workers.
+
+    Every invalidation bumps `generation`. A reader takes it before reading the
+    database and passes it to `put`, which drops the entry when a write was
+    invalidated in the meantime, so a read racing a write never caches the
+    document from before the write.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, CachedResponse]" = OrderedDict()
+        self._oids: Dict[uuid.UUID, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+
+    def get(self, td_id: int) -> Optional[CachedResponse]:
+        entry = self._entries.get(td_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires < time.monotonic():
+            self._remove(td_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(td_id)
+        self.hits += 1
+        return entry
+
+    def get_by_oid(self, oid: uuid.UUID) -> Optional[CachedResponse]:
+        td_id = self._oids.get(oid)
+        if td_id is None:
+            self.misses += 1
+            return None
+        return self.get(td_id)
+
+    def put(self, td_id: int, oid: uuid.UUID, body: bytes, etag: str, generation: Optional[int] = None):
+        if self.max_entries <= 0 or (generation is not None and generation != self.generation):
+            return
+        self._remove(td_id)
+        self._entries[td_id] = CachedResponse(body, etag, oid, time.monotonic() + self.ttl_seconds)
+        self._oids[oid] = td_id
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._oids.pop(evicted.oid, None)
+            self.evictions += 1
+
+    def invalidate(self, td_id: Optional[int] = None, oid: Optional[uuid.UUID] = None):
+        self.generation += 1
+        if td_id is None and oid is not None:
+            td_id = self._oids.get(oid)
+        if td_id is not None and self._remove(td_id):
+            self.invalidations += 1
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._oids.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, td_id: int) -> bool:
+        entry = self._entries.pop(td_id, None)
+        if entry is None:
+            return False
+        self._oids.pop(entry.oid, None)
+        return True
+
+
+td_cache = ResponseCache(settings.TD_CACHE_SIZE, settings.TD_CACHE_TTL_SECONDS)
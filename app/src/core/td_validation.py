@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+import fastjsonschema
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+TD_SCHEMA_PATH = Path(__file__).parent / "schemas" / "td-schema.json"
+
+# Compiled validator of the current process, built once by load_validator()
+_validate: Optional[Callable] = None
+
+
+def load_validator() -> Callable:
+    """Compile the TD 1.1 JSON Schema, once per process"""
+    global _validate
+    if _validate is None:
+        with open(TD_SCHEMA_PATH, encoding="utf-8") as f:
+            _validate = fastjsonschema.compile(json.load(f))
+    return _validate
+
+
+class TDSchemaError(ValueError):
+    """Thing Description not valid against the TD 1.1 JSON Schema"""
+
+
+def validate_td(td: dict) -> Optional[str]:
+    """Validate a Thing Description, returns the first error or None"""
+    try:
+        load_validator()(td)
+    except fastjsonschema.JsonSchemaValueException as e:
+        return e.message
+    return None
+
+
+def validate_tds(tds: List[dict]) -> List[Optional[str]]:
+    return [validate_td(td) for td in tds]
+
+
+class TDValidator:
+    """Thing Description schema validation off the event loop
+
+    Documents larger than TD_VALIDATION_OFFLOAD_BYTES and bulk batches are
+    validated in a process pool whose workers compile the schema at start-up.
+    Small documents are validated inline, where a pool round trip would cost
+    more than the validation itself.
+    """
+
+    def __init__(self, enabled: bool, workers: int, offload_bytes: int):
+        self.enabled = enabled
+        self.workers = workers
+        self.offload_bytes = offload_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        load_validator()
+        if self.workers > 0 and self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=load_validator,
+            )
+            logger.info(f"TD validation pool started with {self.workers} workers")
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def validate(self, td: dict, size: int = 0) -> Optional[str]:
+        if not self.enabled:
+            return None
+        if self._pool is None or size < self.offload_bytes:
+            return validate_td(td)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, validate_td, td)
+
+    async def validate_many(self, tds: List[dict]) -> List[Optional[str]]:
+        """Validate a batch, split in one chunk per worker"""
+        if not self.enabled:
+            return [None] * len(tds)
+        if self._pool is None or not tds:
+            return validate_tds(tds)
+        loop = asyncio.get_running_loop()
+        size = -(-len(tds) // self.workers)
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(self._pool, validate_tds, tds[i:i + size]) for i in range(0, len(tds), size)
+        ))
+        return [error for chunk in chunks for error in chunk]
+
+
+td_validator = TDValidator(settings.TD_VALIDATION, settings.TD_VALIDATION_WORKERS, settings.TD_VALIDATION_OFFLOAD_BYTES)
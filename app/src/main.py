@@ -1,6 +1,10 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from api.routes import router_api as router_main
+from core.catalog_sync import catalog_sync
+from core.notifications import change_feed
+from core.outbox import outbox_dispatcher
+from core.td_validation import td_validator
 from utils.config import settings
 #from utils.lifecycle import initialize
 
@@ -8,8 +12,16 @@ from utils.config import settings
 async def lifespan(app: FastAPI):
     # Startup code — runs before the app starts handling requests
     # await initialize()
+    td_validator.start()
+    await change_feed.start()
+    await outbox_dispatcher.start()
+    await catalog_sync.start()
     yield
     # Shutdown code — runs when the app is shutting down
+    await catalog_sync.stop()
+    await outbox_dispatcher.stop()
+    await change_feed.stop()
+    td_validator.stop()
     print("Lifespan shutdown: cleaning up resources")
 
 # Initialize FastAPI app
@@ -0,0 +1,68 @@
+import json
+from typing import Optional, Tuple
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Executable, ClauseElement
+from persistance.database import is_query_canceled, set_statement_timeout
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a select, keeping its bound parameters"""
+
+    inherit_cache = False
+
+    def __init__(self, query):
+        self.query = query
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.query, **kw)
+
+
+async def estimate_rows(db: AsyncSession, table_name: str) -> Optional[int]:
+    """Row count estimate of a table from pg_class, None if it was never analyzed"""
+    result = await db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"),
+        {"table_name": table_name},
+    )
+    estimate = result.scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return estimate
+
+
+async def planner_estimate(db: AsyncSession, query) -> int:
+    """Number of rows the planner expects `query` to return"""
+    result = await db.execute(Explain(query))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def capped_count(db: AsyncSession, entity, *criteria, cap: int, timeout_ms: int) -> Tuple[int, bool]:
+    """COUNT(*) of the rows matching `criteria`, bounded in rows and time
+
+    Counts at most `cap` rows under a statement timeout. Larger or slower
+    counts fall back to the planner estimate. Returns `(count, exact)`.
+    """
+    matching = select(literal(1)).select_from(entity).where(*criteria)
+    previous = (await db.execute(text("SHOW statement_timeout"))).scalar()
+    try:
+        async with db.begin_nested():
+            await set_statement_timeout(db, timeout_ms)
+            result = await db.execute(select(func.count()).select_from(matching.limit(cap + 1).subquery()))
+            count = result.scalar()
+            # SET LOCAL outlives a released savepoint, the following queries
+            # of the transaction must not run under the count timeout
+            await db.execute(select(func.set_config("statement_timeout", previous, True)))
+    except DBAPIError as e:
+        if not is_query_canceled(e):
+            raise
+        count = cap + 1
+    if count <= cap:
+        return count, True
+    return max(await planner_estimate(db, matching), cap + 1), False
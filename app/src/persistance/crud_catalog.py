@@ -1,21 +1,298 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from persistance.database_models import Dataset
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import select, update, delete, or_, union_all, any_, cast, func, literal, literal_column, null, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert
+from typing import Any, Dict, List, Optional, Tuple
+from core.catalog_snapshot import catalog_snapshot, validate_dataset
+from core.policy import Context
+from core.policy_index import policy_index
+from persistance.counting import capped_count, estimate_rows
+from persistance.policies import split_policies, store_policies
+from persistance.tables import DATASET_CHANGE_SEQ, DATASET_DOCUMENT, Dataset, DatasetTombstone, PolicyDB
+from utils.config import settings
+from utils.pagination import keyset_order, keyset_page, keyset_query
+
+
+# pg_advisory_xact_lock key serializing dataset writes
+CATALOG_CHANGES_LOCK = 0x64617461
+
+
+async def _lock_changes(db: AsyncSession):
+    """Serialize dataset writes until commit
+
+    Change sequence numbers are then committed in increasing order, so a mirror
+    reading past a watermark never misses a change committed later with a
+    lower number.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(CATALOG_CHANGES_LOCK)))
+
+
+def parse_modified(value: str) -> Tuple[datetime, bool]:
+    """Instant of an ISO 8601 date or date-time, and whether it is a plain date
+
+    Dates are taken at midnight UTC and date-times without offset as UTC, so
+    that stored dates and filter bounds compare as instants. Raises ValueError.
+    """
+    try:
+        return datetime.combine(date.fromisoformat(value), time(), timezone.utc), True
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed, False
+
+
+def _modified_at(dataset_data: dict) -> Optional[datetime]:
+    """Value of the modified_at column, None when `modified` is missing or invalid"""
+    try:
+        return parse_modified(dataset_data["modified"])[0]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _select_datasets():
+    """`(id, dataset_data)` rows with the offers of the datasets in hasPolicy"""
+    return select(Dataset.id, DATASET_DOCUMENT.label("dataset_data"))
 
 
 async def get_dataset(db: AsyncSession, dataset_id: str):
-    result = await db.execute(select(Dataset).where(Dataset.id == dataset_id))
-    return result.scalar_one_or_none()
+    result = await db.execute(_select_datasets().where(Dataset.id == dataset_id))
+    return result.first()
+
+
+async def get_dataset_raw(db: AsyncSession, dataset_id: str) -> Optional[bytes]:
+    """Dataset data as JSON text built by Postgres, without decoding the JSONB"""
+    result = await db.execute(select(cast(DATASET_DOCUMENT, Text)).where(Dataset.id == dataset_id))
+    data = result.scalar_one_or_none()
+    return data.encode("utf-8") if data is not None else None
+
+
+def _any_id(column, dataset_ids: List[str]):
+    # A single array parameter, the statement is the same whatever the number of ids
+    return column == any_(literal(list(dataset_ids), ARRAY(Text)))
+
+
+async def get_datasets(db: AsyncSession, dataset_ids: List[str]) -> list:
+    """`(id, dataset_data)` of many ids in one `id = ANY(...)` query, in no particular order"""
+    result = await db.execute(_select_datasets().where(_any_id(Dataset.id, dataset_ids)))
+    return list(result.all())
+
+
+async def get_datasets_raw(db: AsyncSession, dataset_ids: List[str]) -> Dict[str, bytes]:
+    """Dataset data of many ids by id, as JSON text built by Postgres"""
+    result = await db.execute(
+        select(Dataset.id, cast(DATASET_DOCUMENT, Text)).where(_any_id(Dataset.id, dataset_ids))
+    )
+    return {dataset_id: data.encode("utf-8") for dataset_id, data in result.all()}
 
 
 async def create_dataset(db: AsyncSession, dataset_id: str, dataset_data: dict):
-    new_dataset = Dataset(id=dataset_id, dataset_data=dataset_data)
+    """Create a dataset, raises pydantic ValidationError if it is not a valid catalog entry"""
+    dataset_data, serialized = validate_dataset(dataset_data)
+    await _lock_changes(db)
+    await db.execute(delete(DatasetTombstone).where(DatasetTombstone.id == dataset_id))
+    stored, policy_ids, policies = split_policies(dataset_data)
+    await store_policies(db, policies)
+    new_dataset = Dataset(
+        id=dataset_id, dataset_data=stored, policy_ids=policy_ids, modified_at=_modified_at(dataset_data)
+    )
     db.add(new_dataset)
     await db.commit()
     await db.refresh(new_dataset)
+    catalog_snapshot.upsert(dataset_id, serialized, new_dataset.change_seq)
+    policy_index.upsert(dataset_id, dataset_data.get("hasPolicy"), new_dataset.change_seq)
     return new_dataset
 
 
+async def update_dataset(db: AsyncSession, dataset_id: str, dataset_data: dict) -> Optional[Dataset]:
+    """Replace the data of a dataset, raises pydantic ValidationError like create_dataset"""
+    dataset_data, serialized = validate_dataset(dataset_data)
+    await _lock_changes(db)
+    stored, policy_ids, policies = split_policies(dataset_data)
+    await store_policies(db, policies)
+    result = await db.execute(
+        update(Dataset)
+        .where(Dataset.id == dataset_id)
+        .values(dataset_data=stored, policy_ids=policy_ids, modified_at=_modified_at(dataset_data))
+        .returning(Dataset)
+    )
+    dataset = result.scalar_one_or_none()
+    await db.commit()
+    if dataset:
+        catalog_snapshot.upsert(dataset_id, serialized, dataset.change_seq)
+        policy_index.upsert(dataset_id, dataset_data.get("hasPolicy"), dataset.change_seq)
+    return dataset
+
+
+async def upsert_datasets(db: AsyncSession, datasets: List[Tuple[str, dict, bytes]]) -> Dict[str, bool]:
+    """Create or replace a batch of datasets with a single INSERT ... ON CONFLICT DO UPDATE
+
+    `datasets` holds the `(id, dataset_data, serialized)` of datasets validated
+    with validate_dataset, the last entry of an id wins. Returns by id whether
+    the dataset was created rather than updated.
+    """
+    latest = {dataset_id: (dataset_data, serialized) for dataset_id, dataset_data, serialized in datasets}
+    if not latest:
+        return {}
+    await _lock_changes(db)
+    await db.execute(delete(DatasetTombstone).where(_any_id(DatasetTombstone.id, list(latest))))
+    rows, policies = [], {}
+    for dataset_id, (dataset_data, _) in latest.items():
+        stored, policy_ids, found = split_policies(dataset_data)
+        rows.append({
+            "id": dataset_id,
+            "dataset_data": stored,
+            "policy_ids": policy_ids,
+            "modified_at": _modified_at(dataset_data),
+        })
+        policies.update(found)
+    await store_policies(db, policies)
+    statement = insert(Dataset).values(rows)
+    result = await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Dataset.id],
+            set_={
+                "dataset_data": statement.excluded.dataset_data,
+                "policy_ids": statement.excluded.policy_ids,
+                "modified_at": statement.excluded.modified_at,
+                "updated_at": func.now(),
+                "change_seq": DATASET_CHANGE_SEQ.next_value(),
+            },
+        ).returning(Dataset.id, literal_column("xmax = 0"), Dataset.change_seq)
+    )
+    written = {dataset_id: (inserted, change_seq) for dataset_id, inserted, change_seq in result.all()}
+    await db.commit()
+    for dataset_id, (dataset_data, serialized) in latest.items():
+        change_seq = written[dataset_id][1]
+        catalog_snapshot.upsert(dataset_id, serialized, change_seq)
+        policy_index.upsert(dataset_id, dataset_data.get("hasPolicy"), change_seq)
+    return {dataset_id: inserted for dataset_id, (inserted, _) in written.items()}
+
+
+async def delete_dataset(db: AsyncSession, dataset_id: str) -> bool:
+    """Delete a dataset, leaving a tombstone for catalog mirrors"""
+    await _lock_changes(db)
+    result = await db.execute(delete(Dataset).where(Dataset.id == dataset_id).returning(Dataset.id))
+    deleted = result.scalar_one_or_none() is not None
+    if deleted:
+        result = await db.execute(
+            insert(DatasetTombstone)
+            .values(id=dataset_id)
+            .on_conflict_do_update(
+                index_elements=[DatasetTombstone.id],
+                set_={"deleted_at": func.now(), "change_seq": DATASET_CHANGE_SEQ.next_value()},
+            )
+            .returning(DatasetTombstone.change_seq)
+        )
+        change_seq = result.scalar_one()
+    await db.commit()
+    if deleted:
+        catalog_snapshot.remove(dataset_id, change_seq)
+        policy_index.remove(dataset_id, change_seq)
+    return deleted
+
+
+async def get_dataset_changes(
+    db: AsyncSession, since: int = 0, limit: int = 100, modified_since: Optional[datetime] = None
+) -> List[Tuple[int, str, Optional[Any]]]:
+    """Dataset writes and deletes after the `since` change sequence number
+
+    Returns up to `limit` `(change_seq, id, dataset_data)` in change order, with
+    dataset_data None for deleted datasets. `modified_since` also restricts
+    changes by time, for a first sync.
+    """
+    datasets = select(
+        Dataset.change_seq.label("change_seq"), Dataset.id.label("id"), DATASET_DOCUMENT.label("dataset_data")
+    ).where(Dataset.change_seq > since)
+    tombstones = select(
+        DatasetTombstone.change_seq, DatasetTombstone.id, cast(null(), JSONB)
+    ).where(DatasetTombstone.change_seq > since)
+    if modified_since is not None:
+        datasets = datasets.where(Dataset.updated_at > modified_since)
+        tombstones = tombstones.where(DatasetTombstone.deleted_at > modified_since)
+    changes = union_all(datasets, tombstones).subquery()
+    result = await db.execute(select(changes).order_by(changes.c.change_seq).limit(limit))
+    return result.all()
+
+
+async def visibility_criteria(
+    context: Context, participant: Optional[str] = None, action: Optional[str] = None
+) -> list:
+    """Criteria keeping the datasets with an offer the context satisfies, for `action` or any action
+
+    The shorter of the visible and hidden id lists is sent as a single array
+    parameter, no criteria when every dataset is visible.
+    """
+    visible, hidden = await policy_index.partition(context, participant, action)
+    if not hidden:
+        return []
+    if len(visible) <= len(hidden):
+        return [_any_id(Dataset.id, list(visible))]
+    return [~_any_id(Dataset.id, list(hidden))]
+
+
+def dataset_filter_criteria(
+    keyword: Optional[str] = None,
+    format: Optional[str] = None,
+    license: Optional[str] = None,
+    modified_after: Optional[str] = None,
+    modified_before: Optional[str] = None,
+    action: Optional[str] = None,
+) -> list:
+    """WHERE clauses of a catalog filter, raises ValueError for invalid dates
+
+    Keyword, format and license are JSONB containment served by the GIN index,
+    the modified range (inclusive, ISO 8601) by the modified_at index. A plain
+    date as upper bound includes the whole day. Actions are matched in the
+    policies table, then datasets by their policy_ids.
+    """
+    criteria = []
+    if keyword is not None:
+        criteria.append(Dataset.dataset_data.contains({"keyword": [keyword]}))
+    if format is not None:
+        criteria.append(Dataset.dataset_data.contains({"distribution": [{"format": format}]}))
+    if license is not None:
+        criteria.append(Dataset.dataset_data.contains({"license": license}))
+    if modified_after is not None:
+        criteria.append(Dataset.modified_at >= parse_modified(modified_after)[0])
+    if modified_before is not None:
+        bound, is_date = parse_modified(modified_before)
+        criteria.append(Dataset.modified_at < bound + timedelta(days=1) if is_date else Dataset.modified_at <= bound)
+    if action is not None:
+        name = action.removeprefix("odrl:")
+        policies = select(func.array_agg(PolicyDB.hash)).where(or_(*(
+            PolicyDB.policy.contains({"permission": [{"action": value}]}) for value in (name, f"odrl:{name}")
+        )))
+        criteria.append(Dataset.policy_ids.overlap(policies.scalar_subquery()))
+    return criteria
+
+
+async def get_dataset_page(
+    db: AsyncSession, criteria: list, limit: int, cursor: Optional[dict] = None, order: str = "id"
+) -> Tuple[List[str], Optional[dict], Optional[dict]]:
+    """Ids of a page of matching datasets, with keyset pagination
+
+    Ordered by `id` or by `(updated_at, id)`, returns the ids together with the
+    keyset positions of the next and previous pages (None when there is none).
+    """
+    order, backwards = keyset_order(cursor, order)
+    key = (Dataset.updated_at, Dataset.id) if order == "updated" else (Dataset.id,)
+    result = await db.execute(
+        keyset_query(select(*key).where(*criteria), key, limit, cursor, order, backwards, id_type=str)
+    )
+    rows, next_cursor, prev_cursor = keyset_page(result.all(), limit, cursor, order, backwards, key_of=tuple)
+    return [row[-1] for row in rows], next_cursor, prev_cursor
+
+
 async def get_all_datasets(db: AsyncSession):
     result = await db.execute(select(Dataset))
     return result.scalars().all()
+
+
+async def count_datasets(db: AsyncSession, exact: bool = False) -> Tuple[int, bool]:
+    if not exact:
+        estimate = await estimate_rows(db, Dataset.__tablename__)
+        if estimate is not None:
+            return estimate, False
+    return await capped_count(db, Dataset, cap=settings.COUNT_EXACT_CAP, timeout_ms=settings.COUNT_TIMEOUT_MS)
@@ -0,0 +1,105 @@
+import uuid
+from typing import Any, Optional
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.negotiation import NegotiationConflict, NegotiationError, State, callback_message, check_transition
+from core.outbox import outbox_dispatcher
+from persistance.outbox import enqueue_message
+from persistance.tables import ContractNegotiationDB
+
+
+def new_pid() -> str:
+    return f"urn:uuid:{uuid.uuid4()}"
+
+
+async def create_negotiation(
+    db: AsyncSession,
+    consumer_pid: str,
+    offer: dict,
+    callback_address: str,
+    state: State = State.REQUESTED,
+) -> ContractNegotiationDB:
+    """Start a negotiation, with a new providerPid
+
+    Idempotent on `consumer_pid`: a request repeated by the consumer, e.g.
+    after a timeout, returns the negotiation it already started.
+    """
+    check_transition(None, state)
+    result = await db.execute(
+        insert(ContractNegotiationDB)
+        .values(
+            provider_pid=new_pid(),
+            consumer_pid=consumer_pid,
+            state=state.value,
+            dataset_id=offer.get("odrl:target"),
+            offer=offer,
+            callback_address=callback_address,
+        )
+        .on_conflict_do_nothing(index_elements=[ContractNegotiationDB.consumer_pid])
+        .returning(ContractNegotiationDB)
+    )
+    negotiation = result.scalars().first()
+    if negotiation is None:
+        negotiation = await get_negotiation_by_consumer_pid(db, consumer_pid)
+    await db.commit()
+    return negotiation
+
+
+async def get_negotiation(db: AsyncSession, provider_pid: str) -> Optional[ContractNegotiationDB]:
+    result = await db.execute(select(ContractNegotiationDB).where(ContractNegotiationDB.provider_pid == provider_pid))
+    return result.scalars().first()
+
+
+async def get_negotiation_by_consumer_pid(db: AsyncSession, consumer_pid: str) -> Optional[ContractNegotiationDB]:
+    result = await db.execute(select(ContractNegotiationDB).where(ContractNegotiationDB.consumer_pid == consumer_pid))
+    return result.scalars().first()
+
+
+async def transition_negotiation(
+    db: AsyncSession,
+    provider_pid: str,
+    state: State,
+    consumer_pid: Optional[str] = None,
+    **values: Any,
+) -> Optional[ContractNegotiationDB]:
+    """Move a negotiation to `state`, setting `values` on the way
+
+    The current state is read without locking the row and the UPDATE only
+    applies while the version is still the one read (optimistic concurrency).
+    Messages for different negotiations never wait on each other, a message
+    racing another one on the same negotiation raises NegotiationConflict and
+    can be sent again. Returns None when the negotiation does not exist and
+    raises NegotiationError when the state graph does not allow the
+    transition or `consumer_pid` is not the one of the negotiation.
+
+    The message telling the consumer about the new state, if any, is written
+    to the outbox in the same transaction and sent in the background.
+    """
+    result = await db.execute(
+        select(ContractNegotiationDB.state, ContractNegotiationDB.version, ContractNegotiationDB.consumer_pid)
+        .where(ContractNegotiationDB.provider_pid == provider_pid)
+    )
+    current = result.first()
+    if current is None:
+        return None
+    if consumer_pid is not None and consumer_pid != current.consumer_pid:
+        raise NegotiationError("consumerPid does not match the negotiation")
+    check_transition(current.state, state)
+    result = await db.execute(
+        update(ContractNegotiationDB)
+        .where(ContractNegotiationDB.provider_pid == provider_pid, ContractNegotiationDB.version == current.version)
+        .values(state=state.value, version=ContractNegotiationDB.version + 1, **values)
+        .returning(ContractNegotiationDB)
+    )
+    negotiation = result.scalars().first()
+    if negotiation is None:
+        await db.rollback()
+        raise NegotiationConflict(f"Negotiation {provider_pid} was changed concurrently")
+    callback = callback_message(negotiation)
+    if callback is not None:
+        await enqueue_message(db, *callback)
+    await db.commit()
+    if callback is not None:
+        outbox_dispatcher.wake()
+    return negotiation
@@ -1,12 +1,340 @@
+import re
+import json
 import uuid
+import orjson
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
-from typing import List, Optional
-from persistance.tables import ThingDescriptionDB
+from sqlalchemy import insert, update, delete, cast, func, literal, literal_column, case, type_coerce, or_, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, JSONPATH, REGCONFIG
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Any, AsyncIterator, List, NamedTuple, Optional, Tuple
+from core.notifications import TD_CHANNEL
+from core.td_cache import td_cache
+from core.td_validation import TDSchemaError, td_validator
+from persistance.counting import capped_count, estimate_rows
+from persistance.database import set_statement_timeout
+from persistance.fragments import (
+    AFFORDANCES, FRAGMENT_KEY, SHARED_MEMBERS, fragment_locations, fragment_store, get_path, nest
+)
+from persistance.tables import TDFragmentDB, ThingDescriptionDB
+from utils.config import settings
+from utils.pagination import keyset_order, keyset_page, keyset_query
 
 URN = "urn:circ:<org>:wot:<uuid>"
 
+
+class ProjectedTD(NamedTuple):
+    id: int
+    oid: uuid.UUID
+    updated: datetime
+    td: dict
+
+
+class RawTD(NamedTuple):
+    id: int
+    oid: uuid.UUID
+    updated: datetime
+    td: bytes
+
+
+def containment_document(conditions: List[Tuple[str, Any]]) -> dict:
+    """Compile `(path, value)` conditions into a single JSONB containment document
+
+    Paths are dot separated, a segment suffixed with `[]` matches any element of
+    an array, e.g. `("properties.temperature.type", "number")` or
+    `("@type[]", "saref:Sensor")`. Raises ValueError on conflicting conditions.
+    """
+    document: dict = {}
+    for path, value in conditions:
+        segments = path.split(".")
+        if not path or any(segment in ("", "[]") for segment in segments):
+            raise ValueError(f"Invalid path: {path}")
+        node = document
+        for i, segment in enumerate(segments):
+            is_array = segment.endswith("[]")
+            key = segment[:-2] if is_array else segment
+            last = i == len(segments) - 1
+            if is_array:
+                # Every array condition adds a new element the array must contain
+                element = value if last else {}
+                elements = node.setdefault(key, [])
+                if not isinstance(elements, list):
+                    raise ValueError(f"Conflicting conditions on: {path}")
+                elements.append(element)
+                node = element
+            elif last:
+                if key in node and node[key] != value:
+                    raise ValueError(f"Conflicting conditions on: {path}")
+                node[key] = value
+            else:
+                node = node.setdefault(key, {})
+                if not isinstance(node, dict):
+                    raise ValueError(f"Conflicting conditions on: {path}")
+    return document
+
+
+def merge_patch_expression(target, patch: dict):
+    """SQL expression applying an RFC 7396 JSON Merge Patch to the JSONB `target`
+
+    Keys patched to null are removed, nested objects are merged recursively
+    (replacing non-object targets with {}) and any other value replaces the
+    target member, so the whole merge runs inside Postgres.
+    """
+    target = type_coerce(target, JSONB)
+    expr = target
+    deleted = [key for key, value in patch.items() if value is None]
+    if deleted:
+        expr = expr.op("-")(literal(deleted, ARRAY(Text)))
+    replaced = {key: value for key, value in patch.items() if value is not None and not isinstance(value, dict)}
+    if replaced:
+        expr = expr.op("||")(literal(replaced, JSONB))
+    merged = []
+    for key, value in patch.items():
+        if isinstance(value, dict):
+            member = target[key]
+            base = case((func.jsonb_typeof(member) == "object", member), else_=literal({}, JSONB))
+            merged += [literal(key, Text), merge_patch_expression(base, value)]
+    if merged:
+        expr = expr.op("||")(func.jsonb_build_object(*merged))
+    return type_coerce(expr, JSONB)
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7396 JSON Merge Patch in Python, `target` is left untouched"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+async def _publish_changes(db: AsyncSession, change: str, rows: List[Tuple[int, uuid.UUID]]):
+    """NOTIFY the change feed, delivered by Postgres only once the transaction commits"""
+    payloads = [json.dumps({"type": change, "id": td_id, "oid": str(oid)}) for td_id, oid in rows]
+    if not payloads:
+        return
+    notifications = func.unnest(literal(payloads, ARRAY(Text))).table_valued("payload")
+    await db.execute(select(func.pg_notify(TD_CHANNEL, notifications.c.payload)))
+
+
+def _version_filter(if_updated: Optional[List[datetime]]) -> list:
+    """WHERE clause restricting a write to the expected versions"""
+    if if_updated is None:
+        return []
+    return [ThingDescriptionDB.updated.in_(if_updated)]
+
+
+def projection_expression(fields: List[str]):
+    """jsonb_build_object projection of the dot separated `fields` of td
+
+    A field also requested through one of its parents is returned whole with it.
+    """
+    return _build_projection(_projection_tree(fields), ())
+
+
+def _projection_tree(fields: List[str]) -> dict:
+    tree: dict = {}
+    for field in fields:
+        segments = field.split(".")
+        if any(not segment for segment in segments):
+            raise ValueError(f"Invalid field: {field}")
+        node = tree
+        for segment in segments[:-1]:
+            node = node.setdefault(segment, {})
+            if node is None:
+                break
+        else:
+            node[segments[-1]] = None
+    return tree
+
+
+def _apply_projection(document: Any, tree: dict) -> dict:
+    """Python counterpart of projection_expression, for reassembled documents"""
+    projected = {}
+    for key, subtree in tree.items():
+        if isinstance(document, dict):
+            value = document.get(key)
+        elif isinstance(document, list) and key.lstrip("-").isdigit() and -len(document) <= int(key) < len(document):
+            value = document[int(key)]
+        else:
+            value = None
+        projected[key] = value if subtree is None else _apply_projection(value, subtree)
+    return projected
+
+
+def _stored_field(field: str) -> str:
+    """Field to read from the stored document, fragments can only be read whole"""
+    segments = field.split(".")
+    if segments[0] in SHARED_MEMBERS:
+        return segments[0]
+    if len(segments) > 3 and segments[0] in AFFORDANCES and segments[2] == "forms":
+        return ".".join(segments[:3])
+    return field
+
+
+def _build_projection(tree: dict, path: tuple):
+    arguments = []
+    for key, subtree in tree.items():
+        arguments.append(literal(key, Text))
+        if subtree is None:
+            arguments.append(ThingDescriptionDB.td[path + (key,)])
+        else:
+            arguments.append(_build_projection(subtree, path + (key,)))
+    return func.jsonb_build_object(*arguments, type_=JSONB)
+
+
+def _select_tds(fields: Optional[List[str]] = None):
+    """SELECT of whole Thing Descriptions, or of rows with a projected td"""
+    if not fields:
+        return select(ThingDescriptionDB)
+    return select(
+        ThingDescriptionDB.id,
+        ThingDescriptionDB.oid,
+        ThingDescriptionDB.updated,
+        projection_expression([_stored_field(field) for field in fields]).label("td"),
+    )
+
+
+def _fetch_tds(result, fields: Optional[List[str]] = None) -> list:
+    return list(result.all() if fields else result.scalars().all())
+
+
+async def _load_tds(db: AsyncSession, result, fields: Optional[List[str]] = None) -> list:
+    """Fetch the rows of a _select_tds query with their documents reassembled"""
+    rows = _fetch_tds(result, fields)
+    tds = await fragment_store.hydrate(db, [row.td for row in rows])
+    if fields:
+        if any(_stored_field(field) != field for field in fields):
+            tree = _projection_tree(fields)
+            tds = [_apply_projection(td, tree) for td in tds]
+        return [ProjectedTD(row.id, row.oid, row.updated, td) for row, td in zip(rows, tds)]
+    for db_td, td in zip(rows, tds):
+        _set_td(db_td, td)
+    return rows
+
+
+def _set_td(db_td: ThingDescriptionDB, td: dict):
+    # Reassembled documents are never written back by the unit of work
+    if td is not db_td.td:
+        set_committed_value(db_td, "td", td)
+
+
+async def _hydrate(db: AsyncSession, db_td: Optional[ThingDescriptionDB]) -> Optional[ThingDescriptionDB]:
+    if db_td is not None:
+        _set_td(db_td, (await fragment_store.hydrate(db, [db_td.td]))[0])
+    return db_td
+
+
+async def _check_patched(db: AsyncSession, td: dict):
+    """Roll the patch back if the patched document is not a valid TD
+
+    The size deciding whether validation is offloaded is the one of the
+    patched document, a small patch can leave a large one.
+    """
+    error = await td_validator.validate(td, len(orjson.dumps(td)))
+    if error:
+        await db.rollback()
+        raise TDSchemaError(error)
+
+
+def _fragment_sql(reference: str) -> str:
+    """SQL resolving `reference` to its fragment, left as is when unknown"""
+    return f"coalesce((SELECT f.fragment FROM td_fragments f WHERE f.hash = {reference} ->> '{FRAGMENT_KEY}'), {reference})"
+
+
+def _is_reference_sql(value: str) -> str:
+    return f"(jsonb_typeof({value}) = 'object' AND {value} ? '{FRAGMENT_KEY}')"
+
+
+def _in_sql(members: Tuple[str, ...]) -> str:
+    return ", ".join(f"'{member}'" for member in members)
+
+
+# The stored document with its fragments resolved, in SQL, for the queries
+# that have to see the whole TD (JSONPath)
+_FORMS = "(a.value -> 'forms')"
+_HYDRATED_TD = literal_column(
+    "(SELECT coalesce(jsonb_object_agg(m.key, CASE"
+    f" WHEN m.key IN ({_in_sql(SHARED_MEMBERS)}) AND {_is_reference_sql('m.value')}"
+    f" THEN {_fragment_sql('m.value')}"
+    f" WHEN m.key IN ({_in_sql(AFFORDANCES)}) AND jsonb_typeof(m.value) = 'object'"
+    " THEN (SELECT coalesce(jsonb_object_agg(a.key, CASE"
+    f" WHEN jsonb_typeof(a.value) = 'object' AND {_is_reference_sql(_FORMS)}"
+    f" THEN a.value || jsonb_build_object('forms', {_fragment_sql(_FORMS)})"
+    " ELSE a.value END), '{}'::jsonb) FROM jsonb_each(m.value) a)"
+    " ELSE m.value END), '{}'::jsonb)"
+    " FROM jsonb_each(thing_descriptions.td) m)",
+    type_=JSONB,
+)
+
+
+def touches_fragments(patch: dict) -> bool:
+    """Whether a merge patch writes into members that may be stored as fragments"""
+    return next(fragment_locations(patch), None) is not None
+
+
+async def containment_criteria(db: AsyncSession, document: dict) -> list:
+    """WHERE clauses for `td @> document` that also match documents holding fragments
+
+    Conditions on shared members match either the inline member or a reference
+    to a fragment containing them. The rest of the document stays a single
+    containment served by the GIN index.
+    """
+    locations = list(fragment_locations(document))
+    inline = document
+    criteria = []
+    for path in locations:
+        subdocument = get_path(document, path)
+        inline = _remove_path(inline, path)
+        alternatives = [ThingDescriptionDB.td.contains(nest(path, subdocument))]
+        hashes = await fragment_store.matching(db, subdocument, settings.TD_FRAGMENT_MATCH_LIMIT)
+        if hashes is None:
+            alternatives.append(
+                ThingDescriptionDB.td[path + (FRAGMENT_KEY,)].astext.in_(
+                    select(TDFragmentDB.hash).where(TDFragmentDB.fragment.contains(subdocument))
+                )
+            )
+        else:
+            alternatives += [ThingDescriptionDB.td.contains(nest(path, {FRAGMENT_KEY: digest})) for digest in hashes]
+        criteria.append(or_(*alternatives))
+    if inline or not criteria:
+        criteria.insert(0, ThingDescriptionDB.td.contains(inline))
+    return criteria
+
+
+def _remove_path(document: dict, path: Tuple[str, ...]) -> dict:
+    """Copy of `document` without the member at `path` and its emptied parents"""
+    copy = dict(document)
+    if len(path) == 1:
+        copy.pop(path[0], None)
+    else:
+        child = _remove_path(document[path[0]], path[1:])
+        if child:
+            copy[path[0]] = child
+        else:
+            copy.pop(path[0])
+    return copy
+
+
+def _text_query(text_query: str):
+    """Prefix tsquery matching every word of `text_query`, None if there are none"""
+    terms = re.findall(r"\w+", text_query)
+    if not terms:
+        return None
+    return func.to_tsquery(literal("simple", REGCONFIG), " & ".join(f"{term}:*" for term in terms))
+
+
+def _keyset_of(order: str):
+    if order == "updated":
+        return lambda db_td: (db_td.updated, db_td.id)
+    return lambda db_td: (db_td.id,)
+
+
 class ThingDescriptionCRUD:
     
     @staticmethod
@@ -16,59 +344,322 @@ class ThingDescriptionCRUD:
         oid=uuid.uuid4()
         td=td_data
         td['oid']=str(oid)
+        td = (await fragment_store.dedup(db, [td]))[0]
         db_td = ThingDescriptionDB(
             oid=oid,
             td=td
         )
         db.add(db_td)
+        await db.flush()
+        await _publish_changes(db, "create", [(db_td.id, oid)])
         await db.commit()
         await db.refresh(db_td)
-        return db_td
+        td_cache.invalidate(db_td.id)
+        return await _hydrate(db, db_td)
     
     @staticmethod
-    async def get_by_id(db: AsyncSession, td_id: int) -> Optional[ThingDescriptionDB]:
+    async def search_text(
+        db: AsyncSession, text_query: str, offset: int = 0, limit: int = 100, fields: Optional[List[str]] = None
+    ) -> Tuple[List[ThingDescriptionDB], bool]:
+        """Full-text search over titles, descriptions and property titles
+
+        Every word of `text_query` must match as a prefix, results are ranked by
+        ts_rank. Returns the page and whether more results follow.
+        """
+        tsquery = _text_query(text_query)
+        if tsquery is None:
+            return [], False
+        result = await db.execute(
+            _select_tds(fields)
+            .filter(ThingDescriptionDB.search_vector.op("@@")(tsquery))
+            .order_by(func.ts_rank(ThingDescriptionDB.search_vector, tsquery).desc(), ThingDescriptionDB.id)
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        rows = await _load_tds(db, result, fields)
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    async def count(
+        db: AsyncSession, text_query: Optional[str] = None, document: Optional[dict] = None, exact: bool = False
+    ) -> Tuple[int, bool]:
+        """Number of Thing Descriptions, optionally filtered by text or containment
+
+        Unfiltered counts come from the table statistics unless `exact` is set,
+        filtered ones are counted up to COUNT_EXACT_CAP. Returns `(count, exact)`.
+        """
+        criteria = []
+        if text_query is not None:
+            tsquery = _text_query(text_query)
+            if tsquery is None:
+                return 0, True
+            criteria.append(ThingDescriptionDB.search_vector.op("@@")(tsquery))
+        if document is not None:
+            criteria += await containment_criteria(db, document)
+        if not criteria and not exact:
+            estimate = await estimate_rows(db, ThingDescriptionDB.__tablename__)
+            if estimate is not None:
+                return estimate, False
+        return await capped_count(
+            db, ThingDescriptionDB, *criteria, cap=settings.COUNT_EXACT_CAP, timeout_ms=settings.COUNT_TIMEOUT_MS
+        )
+
+    @staticmethod
+    async def create_many(db: AsyncSession, tds: List[dict]) -> List[Tuple[int, uuid.UUID]]:
+        """Create a batch of Thing Descriptions with a single multi-row INSERT
+
+        Returns the `(id, oid)` of every created row in the order of `tds`.
+        """
+        oids = []
+        for td in tds:
+            oid = uuid.uuid4()
+            td['oid'] = str(oid)
+            oids.append(oid)
+        stored = await fragment_store.dedup(db, tds)
+        rows = [{"oid": oid, "td": td} for oid, td in zip(oids, stored)]
+        result = await db.execute(
+            insert(ThingDescriptionDB)
+            .values(rows)
+            .returning(ThingDescriptionDB.id, ThingDescriptionDB.oid)
+        )
+        ids = {oid: td_id for td_id, oid in result.all()}
+        await _publish_changes(db, "create", [(td_id, oid) for oid, td_id in ids.items()])
+        await db.commit()
+        for td_id in ids.values():
+            td_cache.invalidate(td_id)
+        return [(ids[row["oid"]], row["oid"]) for row in rows]
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, td_id: int, fields: Optional[List[str]] = None) -> Optional[ThingDescriptionDB]:
         """Get Thing Description by ID"""
-        result = await db.execute(select(ThingDescriptionDB).filter(ThingDescriptionDB.id == td_id))
-        return result.scalars().first()
+        result = await db.execute(_select_tds(fields).filter(ThingDescriptionDB.id == td_id))
+        return next(iter(await _load_tds(db, result, fields)), None)
     
-    # @staticmethod
-    # async def get_by_oid(db: AsyncSession, oid: uuid.UUID) -> Optional[ThingDescriptionDB]:
-    #     """Get Thing Description by OID"""
-    #     result = await db.execute(select(ThingDescriptionDB).filter(ThingDescriptionDB.oid == oid))
-    #     return result.scalars().first()
+    @staticmethod
+    async def get_by_oid(db: AsyncSession, oid: uuid.UUID, fields: Optional[List[str]] = None) -> Optional[ThingDescriptionDB]:
+        """Get Thing Description by OID"""
+        result = await db.execute(_select_tds(fields).filter(ThingDescriptionDB.oid == oid))
+        return next(iter(await _load_tds(db, result, fields)), None)
+
+    @staticmethod
+    async def get_version(db: AsyncSession, td_id: int) -> Optional[datetime]:
+        """Get the last update time of a Thing Description (index only lookup)"""
+        result = await db.execute(select(ThingDescriptionDB.updated).filter(ThingDescriptionDB.id == td_id))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_version_by_oid(db: AsyncSession, oid: uuid.UUID) -> Optional[Tuple[int, datetime]]:
+        """Get the id and last update time of a Thing Description by OID (index only lookup)"""
+        result = await db.execute(
+            select(ThingDescriptionDB.id, ThingDescriptionDB.updated).filter(ThingDescriptionDB.oid == oid)
+        )
+        return result.first()
+
+    @staticmethod
+    async def get_raw(
+        db: AsyncSession, td_id: Optional[int] = None, oid: Optional[uuid.UUID] = None
+    ) -> Optional[RawTD]:
+        """Get Thing Description by ID or OID with the document as the JSON text stored by Postgres
+
+        The JSONB is not decoded, only documents holding fragment references are
+        decoded to be reassembled.
+        """
+        key = ThingDescriptionDB.id == td_id if td_id is not None else ThingDescriptionDB.oid == oid
+        result = await db.execute(
+            select(ThingDescriptionDB.id, ThingDescriptionDB.oid, ThingDescriptionDB.updated, cast(ThingDescriptionDB.td, Text))
+            .filter(key)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        td_id, oid, updated, td = row
+        if FRAGMENT_KEY in td:
+            td = json.dumps((await fragment_store.hydrate(db, [json.loads(td)]))[0])
+        return RawTD(td_id, oid, updated, td.encode("utf-8"))
     
     @staticmethod
-    async def get_all(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[ThingDescriptionDB]:
+    async def get_all(
+        db: AsyncSession, skip: int = 0, limit: int = 100, fields: Optional[List[str]] = None
+    ) -> List[ThingDescriptionDB]:
         """Get all Thing Descriptions with pagination"""
-        result = await db.execute(select(ThingDescriptionDB).offset(skip).limit(limit))
-        return result.scalars().all()
+        result = await db.execute(_select_tds(fields).offset(skip).limit(limit))
+        return await _load_tds(db, result, fields)
+
+    @staticmethod
+    async def get_page(
+        db: AsyncSession,
+        limit: int = 100,
+        cursor: Optional[dict] = None,
+        order: str = "id",
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[ThingDescriptionDB], Optional[dict], Optional[dict]]:
+        """Get a page of Thing Descriptions with keyset pagination
+
+        Ordered by `id` or by `(updated, id)`, returns the rows together with the
+        keyset positions of the next and previous pages (None when there is none).
+        """
+        order, backwards = keyset_order(cursor, order)
+        if order == "updated":
+            key = (ThingDescriptionDB.updated, ThingDescriptionDB.id)
+        else:
+            key = (ThingDescriptionDB.id,)
+        result = await db.execute(
+            keyset_query(_select_tds(fields), key, limit, cursor, order, backwards, id_type=int)
+        )
+        rows = await _load_tds(db, result, fields)
+        return keyset_page(rows, limit, cursor, order, backwards, key_of=_keyset_of(order))
     
     @staticmethod
-    async def update(db: AsyncSession, td_id: int, td_data: dict) -> Optional[ThingDescriptionDB]:
-        """Update Thing Description"""
-        await db.execute(
+    async def stream_all(db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[Tuple[int, uuid.UUID, str]]:
+        """Stream `(id, oid, td as JSON text)` of every Thing Description
+
+        Rows are read through a server-side cursor `batch_size` at a time and the
+        documents are not decoded, so memory does not grow with the directory.
+        Only documents holding fragment references are decoded to be reassembled.
+        """
+        result = await db.stream(
+            select(ThingDescriptionDB.id, ThingDescriptionDB.oid, cast(ThingDescriptionDB.td, Text))
+            .order_by(ThingDescriptionDB.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for td_id, oid, td in result:
+            if FRAGMENT_KEY in td:
+                td = json.dumps((await fragment_store.hydrate(db, [json.loads(td)]))[0])
+            yield td_id, oid, td
+
+    @staticmethod
+    async def update(
+        db: AsyncSession, td_id: int, td_data: dict, if_updated: Optional[List[datetime]] = None
+    ) -> Optional[ThingDescriptionDB]:
+        """Update Thing Description in a single round trip (UPDATE ... RETURNING)
+
+        With `if_updated` the row is only updated while its `updated` is one of the
+        given versions (optimistic concurrency).
+        """
+        td_data = (await fragment_store.dedup(db, [td_data]))[0]
+        # The oid stays part of the document, as set on create
+        td = literal(td_data, JSONB).op("||")(
+            func.jsonb_build_object("oid", cast(ThingDescriptionDB.oid, Text))
+        )
+        result = await db.execute(
             update(ThingDescriptionDB)
-            .where(ThingDescriptionDB.id == td_id)
-            .values(td=td_data)
+            .where(ThingDescriptionDB.id == td_id, *_version_filter(if_updated))
+            .values(td=td)
+            .returning(ThingDescriptionDB)
         )
+        db_td = result.scalars().first()
+        if db_td:
+            await _publish_changes(db, "update", [(db_td.id, db_td.oid)])
         await db.commit()
-        return await ThingDescriptionCRUD.get_by_id(db, td_id)
+        td_cache.invalidate(td_id)
+        return await _hydrate(db, db_td)
+
+    @staticmethod
+    async def patch(
+        db: AsyncSession, td_id: int, patch: dict, if_updated: Optional[List[datetime]] = None
+    ) -> Optional[ThingDescriptionDB]:
+        """Apply a JSON Merge Patch (RFC 7396) to a Thing Description inside Postgres
+
+        Patches writing into members that may be stored as fragments are applied
+        to the reassembled document instead, under a row lock. The patched
+        document is validated against the TD schema before commit, raising
+        TDSchemaError.
+        """
+        patch = {key: value for key, value in patch.items() if key != 'oid'}
+        if touches_fragments(patch):
+            locked = await db.execute(
+                select(ThingDescriptionDB.td)
+                .where(ThingDescriptionDB.id == td_id, *_version_filter(if_updated))
+                .with_for_update()
+            )
+            current = locked.scalars().first()
+            if current is None:
+                await db.commit()
+                return None
+            current = (await fragment_store.hydrate(db, [current]))[0]
+            patched = apply_merge_patch(current, patch)
+            await _check_patched(db, patched)
+            td = (await fragment_store.dedup(db, [patched]))[0]
+        else:
+            td = merge_patch_expression(ThingDescriptionDB.td, patch)
+        result = await db.execute(
+            update(ThingDescriptionDB)
+            .where(ThingDescriptionDB.id == td_id, *_version_filter(if_updated))
+            .values(td=td)
+            .returning(ThingDescriptionDB)
+        )
+        db_td = result.scalars().first()
+        if db_td:
+            db_td = await _hydrate(db, db_td)
+            if not touches_fragments(patch):
+                await _check_patched(db, db_td.td)
+            await _publish_changes(db, "update", [(db_td.id, db_td.oid)])
+        await db.commit()
+        td_cache.invalidate(td_id)
+        return db_td
     
     @staticmethod
-    async def delete(db: AsyncSession, td_id: int) -> bool:
+    async def delete(db: AsyncSession, td_id: int, if_updated: Optional[List[datetime]] = None) -> bool:
         """Delete Thing Description"""
         result = await db.execute(
             delete(ThingDescriptionDB)
-            .where(ThingDescriptionDB.id == td_id)
+            .where(ThingDescriptionDB.id == td_id, *_version_filter(if_updated))
+            .returning(ThingDescriptionDB.oid)
         )
+        oid = result.scalars().first()
+        if oid:
+            await _publish_changes(db, "delete", [(td_id, oid)])
         await db.commit()
-        return result.rowcount > 0
+        td_cache.invalidate(td_id)
+        return oid is not None
     
     @staticmethod
-    async def query_jsonb_field(db: AsyncSession, field_path: str, value: any) -> List[ThingDescriptionDB]:
+    async def query_jsonb_field(
+        db: AsyncSession, field_path: str, value: any, fields: Optional[List[str]] = None
+    ) -> List[ThingDescriptionDB]:
         """Query JSONB field - example: field_path='title', value='MyThing'"""
         result = await db.execute(
-            select(ThingDescriptionDB)
+            _select_tds(fields)
             .filter(ThingDescriptionDB.td[field_path].astext == str(value))
         )
+        return await _load_tds(db, result, fields)
+
+    @staticmethod
+    async def query_containment(
+        db: AsyncSession, document: dict, limit: int = 100, fields: Optional[List[str]] = None
+    ) -> List[ThingDescriptionDB]:
+        """Query Thing Descriptions containing `document` (JSONB @>, served by the GIN index)"""
+        result = await db.execute(
+            _select_tds(fields)
+            .filter(*await containment_criteria(db, document))
+            .order_by(ThingDescriptionDB.id)
+            .limit(limit)
+        )
+        return await _load_tds(db, result, fields)
+
+    @staticmethod
+    async def query_jsonpath(db: AsyncSession, path: str, limit: int = 1000, timeout_ms: int = 2000) -> List[Any]:
+        """Evaluate a Postgres jsonpath over the directory and return the matched values
+
+        Rows are filtered with `@?` and projected with `jsonb_path_query`, both
+        inside Postgres, under a statement timeout. Like `@?`, the projection
+        is silent: a document a strict path cannot be evaluated on (e.g. a
+        missing member) yields no value rather than failing the query. In DEDUP mode the path is
+        evaluated on the documents with their fragments resolved, so
+        `@context`, `securityDefinitions` and `forms` match as when inline.
+        """
+        jsonpath = cast(literal(path), JSONPATH)
+        # jsonb_path_query(target, path, vars, silent)
+        no_vars = cast(literal("{}"), JSONB)
+        if fragment_store.enabled:
+            # Documents holding fragments are matched once reassembled, the GIN
+            # index cannot serve `@?` on them and jsonb_path_query alone filters
+            query = select(func.jsonb_path_query(_HYDRATED_TD, jsonpath, no_vars, True)).select_from(ThingDescriptionDB)
+        else:
+            query = (
+                select(func.jsonb_path_query(ThingDescriptionDB.td, jsonpath, no_vars, True))
+                .filter(ThingDescriptionDB.td.op("@?")(jsonpath))
+            )
+        await set_statement_timeout(db, timeout_ms)
+        result = await db.execute(query.limit(limit))
         return result.scalars().all()
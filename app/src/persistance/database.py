@@ -1,3 +1,5 @@
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
@@ -25,3 +27,13 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+
+async def set_statement_timeout(db: AsyncSession, timeout_ms: int):
+    """Limit the duration of the statements of the current transaction"""
+    await db.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+
+def is_query_canceled(error: DBAPIError) -> bool:
+    """True when the statement was canceled by statement_timeout"""
+    return getattr(error.orig, "sqlstate", None) == "57014"
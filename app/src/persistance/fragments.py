@@ -0,0 +1,166 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from persistance.tables import TDFragmentDB
+from utils.config import settings
+
+# Content addressed storage of the TD subtrees repeated across a fleet of devices
+# of the same model. In DEDUP mode `@context`, `securityDefinitions` and every
+# `forms` array are stored once in td_fragments and referenced from the
+# document as {"$frag": <hash>}.
+
+FRAGMENT_KEY = "$frag"
+SHARED_MEMBERS = ("@context", "securityDefinitions", "forms")
+AFFORDANCES = ("properties", "actions", "events")
+
+
+def fragment_locations(td: dict) -> Iterator[Tuple[str, ...]]:
+    """Paths of the members of `td` that are stored as fragments"""
+    for member in SHARED_MEMBERS:
+        if member in td:
+            yield (member,)
+    for affordance_type in AFFORDANCES:
+        affordances = td.get(affordance_type)
+        if isinstance(affordances, dict):
+            for name, affordance in affordances.items():
+                if isinstance(affordance, dict) and "forms" in affordance:
+                    yield (affordance_type, name, "forms")
+
+
+def is_reference(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and isinstance(value.get(FRAGMENT_KEY), str)
+
+
+def fragment_hash(fragment: Any) -> str:
+    canonical = json.dumps(fragment, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_path(document: dict, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        document = document[key]
+    return document
+
+
+def replace_path(document: dict, path: Tuple[str, ...], value: Any) -> dict:
+    """Copy of `document` with the member at `path` replaced, `document` is left untouched"""
+    head, rest = path[0], path[1:]
+    copy = dict(document)
+    copy[head] = replace_path(document[head], rest, value) if rest else value
+    return copy
+
+
+def nest(path: Tuple[str, ...], value: Any) -> dict:
+    for key in reversed(path):
+        value = {key: value}
+    return value
+
+
+def split_fragments(td: dict, min_bytes: int) -> Tuple[dict, Dict[str, Any]]:
+    """Replace the shared subtrees of `td` by references
+
+    Subtrees smaller than `min_bytes` stay inline, a reference would not be
+    smaller. Returns the document to store and the fragments by hash.
+    """
+    fragments = {}
+    for path in list(fragment_locations(td)):
+        fragment = get_path(td, path)
+        if is_reference(fragment):
+            continue
+        if len(json.dumps(fragment, separators=(",", ":"))) < min_bytes:
+            continue
+        digest = fragment_hash(fragment)
+        fragments[digest] = fragment
+        td = replace_path(td, path, {FRAGMENT_KEY: digest})
+    return td, fragments
+
+
+class FragmentStore:
+    """Writes and resolves TD fragments, with an LRU cache of the hot ones
+
+    Fragments are immutable, cached entries never go stale.
+    """
+
+    def __init__(self, cache_size: int, min_bytes: int, enabled: bool):
+        self.cache_size = cache_size
+        self.min_bytes = min_bytes
+        self.enabled = enabled
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+
+    async def dedup(self, db: AsyncSession, tds: List[dict]) -> List[dict]:
+        """Documents to store for `tds`, writing their fragments in the same transaction"""
+        if not self.enabled:
+            return tds
+        stored, fragments = [], {}
+        for td in tds:
+            td, found = split_fragments(td, self.min_bytes)
+            stored.append(td)
+            fragments.update(found)
+        if fragments:
+            await db.execute(
+                insert(TDFragmentDB)
+                .values([{"hash": digest, "fragment": fragment} for digest, fragment in fragments.items()])
+                .on_conflict_do_nothing(index_elements=[TDFragmentDB.hash])
+            )
+        return stored
+
+    async def hydrate(self, db: AsyncSession, tds: List[Optional[dict]]) -> List[Optional[dict]]:
+        """Reassemble documents holding references, others are returned as is"""
+        references = [
+            [(path, get_path(td, path)[FRAGMENT_KEY]) for path in fragment_locations(td) if is_reference(get_path(td, path))]
+            if isinstance(td, dict) else []
+            for td in tds
+        ]
+        wanted = {digest for paths in references for _, digest in paths}
+        if not wanted:
+            return tds
+        fragments = await self.resolve(db, wanted)
+        hydrated = []
+        for td, paths in zip(tds, references):
+            for path, digest in paths:
+                if digest in fragments:
+                    td = replace_path(td, path, fragments[digest])
+            hydrated.append(td)
+        return hydrated
+
+    async def resolve(self, db: AsyncSession, hashes: set) -> Dict[str, Any]:
+        found = {}
+        for digest in hashes:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                found[digest] = self._cache[digest]
+        missing = [digest for digest in hashes if digest not in found]
+        if missing:
+            result = await db.execute(
+                select(TDFragmentDB.hash, TDFragmentDB.fragment).where(TDFragmentDB.hash.in_(missing))
+            )
+            for digest, fragment in result.all():
+                found[digest] = fragment
+                self._put(digest, fragment)
+        return found
+
+    async def matching(self, db: AsyncSession, subdocument: Any, limit: int) -> Optional[List[str]]:
+        """Hashes of the fragments containing `subdocument`, None when more than `limit` match"""
+        result = await db.execute(
+            select(TDFragmentDB.hash).where(TDFragmentDB.fragment.contains(subdocument)).limit(limit + 1)
+        )
+        hashes = result.scalars().all()
+        return None if len(hashes) > limit else hashes
+
+    def _put(self, digest: str, fragment: Any):
+        if self.cache_size <= 0:
+            return
+        self._cache[digest] = fragment
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+fragment_store = FragmentStore(
+    settings.TD_FRAGMENT_CACHE_SIZE,
+    settings.TD_FRAGMENT_MIN_BYTES,
+    enabled=settings.TD_STORAGE_MODE.upper() == "DEDUP",
+)
@@ -40,6 +40,14 @@ class Policy(BaseModel):
     class Config:
         populate_by_name = True
 
+    @model_validator(mode="before")
+    @classmethod
+    def check_policy_reference(cls, data: Any) -> Any:
+        # Key of the stored offer references, see persistance.policies
+        if isinstance(data, dict) and "$policy" in data:
+            raise ValueError("$policy is reserved for stored offers")
+        return data
+
 
 class Distribution(BaseModel):
     """Reprezentuje distribuciu datasetu."""
@@ -134,4 +142,16 @@ class DatasetResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+
+class DatasetLookupResponse(BaseModel):
+    datasets: list[Dataset]
+    missing: list[str] = Field(description="Requested ids without a dataset")
+
+
+class CatalogDeltaResponse(BaseModel):
+    datasets: list[Dataset]
+    deleted: list[str] = Field(description="Ids of the datasets deleted since the watermark")
+    watermark: int = Field(description="Change sequence number to pass as `since` on the next request")
+    hasMore: bool
+
 # Test dataset response
\ No newline at end of file
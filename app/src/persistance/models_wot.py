@@ -1,5 +1,5 @@
 import uuid
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, Dict, Any
 
 # Pydantic models for API
@@ -12,6 +12,10 @@ class ThingDescription(BaseModel):
     events: Dict[str, Any] = {}
 
 class ThingDescriptionCreate(BaseModel):
+    # Remaining TD members (@context, security, forms...) are kept and checked
+    # against the TD 1.1 JSON Schema
+    model_config = ConfigDict(extra="allow")
+
     title: str
     description: Optional[str] = None
     properties: Dict[str, Any] = {}
@@ -26,4 +30,8 @@ class ThingDescriptionResponse(BaseModel):
     td: Dict[str, Any]
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CountResponse(BaseModel):
+    count: int
+    exact: bool = Field(description="False when the count is a planner or statistics estimate")
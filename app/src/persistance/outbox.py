@@ -0,0 +1,72 @@
+from datetime import timedelta
+from typing import Any, Collection, Dict, List
+from sqlalchemy import BigInteger, all_, any_, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from persistance.tables import OutboxMessageDB
+
+
+async def enqueue_message(db: AsyncSession, target: str, message: dict):
+    """Add a message to the outbox, sent by core.outbox once the transaction commits"""
+    await db.execute(insert(OutboxMessageDB).values(target=target, message=message))
+
+
+async def claim_messages(
+    db: AsyncSession, limit: int, lease_seconds: float, exclude: Collection[int] = ()
+) -> List[Any]:
+    """Take up to `limit` due messages, `(id, target, message, attempts)` rows
+
+    Rows locked by other workers are skipped and the claimed ones are due
+    again after `lease_seconds`, so a message of a crashed worker is sent
+    again rather than lost. Messages in `exclude`, still held by the caller,
+    are never claimed twice.
+    """
+    due = (
+        select(OutboxMessageDB.id)
+        .where(OutboxMessageDB.next_attempt_at <= func.now())
+        .where(OutboxMessageDB.id != all_(literal(list(exclude), ARRAY(BigInteger))))
+        .order_by(OutboxMessageDB.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(OutboxMessageDB)
+        .where(OutboxMessageDB.id.in_(due))
+        .values(
+            attempts=OutboxMessageDB.attempts + 1,
+            next_attempt_at=func.now() + literal(timedelta(seconds=lease_seconds)),
+        )
+        .returning(OutboxMessageDB.id, OutboxMessageDB.target, OutboxMessageDB.message, OutboxMessageDB.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    messages = list(result.all())
+    await db.commit()
+    return messages
+
+
+async def renew_leases(db: AsyncSession, message_ids: Collection[int], lease_seconds: float):
+    """Push back the lease of messages still waiting for or in delivery"""
+    await db.execute(
+        update(OutboxMessageDB)
+        .where(OutboxMessageDB.id == any_(literal(list(message_ids), ARRAY(BigInteger))))
+        .values(next_attempt_at=func.now() + literal(timedelta(seconds=lease_seconds)))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def record_deliveries(db: AsyncSession, delivered: List[int], failed: List[Dict[str, Any]]):
+    """Delete the delivered messages and reschedule the failed ones
+
+    `failed` holds `{"id", "next_attempt_at", "last_error"}` items,
+    `next_attempt_at` being None for messages given up.
+    """
+    if delivered:
+        await db.execute(
+            delete(OutboxMessageDB).where(OutboxMessageDB.id == any_(literal(delivered, ARRAY(BigInteger))))
+        )
+    if failed:
+        # Bulk UPDATE by primary key, a single executemany
+        await db.execute(update(OutboxMessageDB), failed)
+    await db.commit()
+
@@ -0,0 +1,54 @@
+from typing import Any, Dict, List, Tuple
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.policy import policy_hash
+from persistance.tables import PolicyDB
+
+# Hash-consed storage of the ODRL offers of datasets. Offers that differ only by
+# their @id are stored once in policies, keyed by the hash of the rest of the
+# offer, and hasPolicy keeps {"@id": <offer id>, "$policy": <hash>}. Readers get
+# the offers back through tables.DATASET_DOCUMENT.
+
+POLICY_KEY = "$policy"
+
+
+def policy_terms(offer: dict) -> dict:
+    """Offer without its @id, the part shared by datasets"""
+    return {key: value for key, value in offer.items() if key != "@id"}
+
+
+def offer_hash(offer: dict) -> str:
+    return policy_hash(policy_terms(offer))
+
+
+def split_policies(dataset_data: dict) -> Tuple[dict, List[str], Dict[str, Any]]:
+    """Replace the hasPolicy offers of a dataset by references
+
+    `dataset_data` is the document returned by validate_dataset, with the
+    offer members keyed by alias and no `$policy` sent by the client. Returns
+    the dataset data to store, the hashes of its offers in order and the
+    offers to store by hash.
+    """
+    offers = dataset_data.get("hasPolicy")
+    if not isinstance(offers, list) or not offers:
+        return dataset_data, [], {}
+    references, hashes, policies = [], [], {}
+    for offer in offers:
+        if not isinstance(offer, dict):
+            references.append(offer)
+            continue
+        digest = offer_hash(offer)
+        policies[digest] = policy_terms(offer)
+        hashes.append(digest)
+        references.append({"@id": offer.get("@id"), POLICY_KEY: digest})
+    return dict(dataset_data, hasPolicy=references), hashes, policies
+
+
+async def store_policies(db: AsyncSession, policies: Dict[str, Any]):
+    """Write offers not stored yet, in the transaction of the datasets referencing them"""
+    if policies:
+        await db.execute(
+            insert(PolicyDB)
+            .values([{"hash": digest, "policy": policy} for digest, policy in policies.items()])
+            .on_conflict_do_nothing(index_elements=[PolicyDB.hash])
+        )
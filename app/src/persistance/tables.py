@@ -1,12 +1,21 @@
 import uuid
-from sqlalchemy import Text, Column, Integer, String, DateTime, func
-from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy import Text, BigInteger, Column, Computed, Integer, String, DateTime, Index, Sequence, case, column, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR, UUID, aggregate_order_by
+from sqlalchemy.orm import deferred
 from persistance.database import Base
 
+# Full-text document of a TD: title (A), description (B) and property titles (C)
+TD_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(td->>'title', '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(td->>'description', '')), 'B') || "
+    "setweight(jsonb_to_tsvector('simple'::regconfig, "
+    "jsonb_path_query_array(td, '$.properties.*.title'), '[\"string\"]'), 'C')"
+)
+
 class ThingDescriptionDB(Base):
     __tablename__ = "thing_descriptions"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     oid = Column(UUID(as_uuid=True), default=uuid.uuid4, unique=True, nullable=False, index=True)
     td = Column(JSONB, nullable=False)
     # owner
@@ -14,6 +23,41 @@ class ThingDescriptionDB(Base):
     # privacy
     created = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # Generated by Postgres, only used in WHERE clauses so never loaded
+    search_vector = deferred(Column(TSVECTOR, Computed(TD_SEARCH_VECTOR, persisted=True)))
+
+    __table_args__ = (
+        # Keyset pagination over change order
+        Index("ix_thing_descriptions_updated_id", "updated", "id"),
+        # Covering index, ETag checks by id read only the index and the timestamp
+        Index("ix_thing_descriptions_id_updated", "id", postgresql_include=["updated"]),
+        # JSONB containment (@>) search
+        Index(
+            "ix_thing_descriptions_td_path_ops",
+            "td",
+            postgresql_using="gin",
+            postgresql_ops={"td": "jsonb_path_ops"},
+        ),
+        Index("ix_thing_descriptions_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+# Shared TD subtree, referenced from thing_descriptions.td as {"$frag": hash}
+class TDFragmentDB(Base):
+    __tablename__ = "td_fragments"
+
+    hash = Column(Text, primary_key=True)
+    fragment = Column(JSONB, nullable=False)
+    created = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        # Containment search inside fragments
+        Index(
+            "ix_td_fragments_fragment_path_ops",
+            "fragment",
+            postgresql_using="gin",
+            postgresql_ops={"fragment": "jsonb_path_ops"},
+        ),
+    )
 
 class Catalog(Base):
     __tablename__ = "catalogs"
@@ -24,10 +68,151 @@ class Catalog(Base):
     catalog_data = Column(JSONB, nullable=False)
 
 
+# Position of dataset writes and deletes in the change feed of the catalog
+DATASET_CHANGE_SEQ = Sequence("dataset_change_seq", metadata=Base.metadata)
+
 class Dataset(Base):
     __tablename__ = "datasets"
 
     id = Column(Text, primary_key=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
-    dataset_data = Column(JSONB, nullable=False)
\ No newline at end of file
+    dataset_data = Column(JSONB, nullable=False)
+    # Hashes of the hasPolicy offers stored in policies, in hasPolicy order
+    policy_ids = Column(ARRAY(Text), nullable=False, server_default=text("'{}'"))
+    # `modified` of dataset_data as an instant, NULL when it is not ISO 8601
+    modified_at = Column(DateTime(timezone=True), nullable=True)
+    change_seq = Column(
+        BigInteger,
+        nullable=False,
+        server_default=DATASET_CHANGE_SEQ.next_value(),
+        onupdate=DATASET_CHANGE_SEQ.next_value(),
+    )
+
+    __table_args__ = (
+        # Delta sync of the catalog
+        Index("ix_datasets_change_seq", "change_seq", unique=True),
+        # Keyset pagination of the catalog over change order
+        Index("ix_datasets_updated_at_id", "updated_at", "id"),
+        # Catalog filters: keyword, distribution format, license and policy action containment (@>)
+        Index(
+            "ix_datasets_dataset_data_path_ops",
+            "dataset_data",
+            postgresql_using="gin",
+            postgresql_ops={"dataset_data": "jsonb_path_ops"},
+        ),
+        # Datasets sharing a policy (&&, @>)
+        Index("ix_datasets_policy_ids", "policy_ids", postgresql_using="gin"),
+        # Catalog filter on the modification date
+        Index("ix_datasets_modified_at", "modified_at"),
+    )
+
+# ODRL offer shared by datasets, stored once without its @id and keyed by
+# the hash of its content. Datasets keep {"@id": ..., "$policy": <hash>}.
+class PolicyDB(Base):
+    __tablename__ = "policies"
+
+    hash = Column(Text, primary_key=True)
+    policy = Column(JSONB, nullable=False)
+    created = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        # Catalog filter on policy actions
+        Index(
+            "ix_policies_policy_path_ops",
+            "policy",
+            postgresql_using="gin",
+            postgresql_ops={"policy": "jsonb_path_ops"},
+        ),
+    )
+
+# Deleted dataset, kept so that catalog mirrors learn about the deletion
+class DatasetTombstone(Base):
+    __tablename__ = "dataset_tombstones"
+
+    id = Column(Text, primary_key=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default=DATASET_CHANGE_SEQ.next_value())
+
+    __table_args__ = (
+        Index("ix_dataset_tombstones_change_seq", "change_seq", unique=True),
+        Index("ix_dataset_tombstones_deleted_at", "deleted_at"),
+    )
+
+# Dataset data with its hasPolicy references replaced by the offers, built by
+# Postgres so that readers can still fetch the document as JSON text
+_policy_refs = (
+    func.jsonb_array_elements(Dataset.dataset_data["hasPolicy"])
+    .table_valued(column("value", JSONB), with_ordinality="ordinality")
+    .render_derived(name="refs")
+)
+_hydrated_offers = (
+    select(
+        func.jsonb_agg(
+            aggregate_order_by(
+                func.coalesce(
+                    func.jsonb_build_object("@id", _policy_refs.c.value["@id"]).op("||")(PolicyDB.policy),
+                    _policy_refs.c.value,
+                ),
+                _policy_refs.c.ordinality,
+            ),
+            type_=JSONB,
+        )
+    )
+    .select_from(
+        _policy_refs.outerjoin(
+            PolicyDB, PolicyDB.hash == _policy_refs.c.value.op("->>", return_type=Text)(literal_column("'$policy'"))
+        )
+    )
+    .scalar_subquery()
+)
+DATASET_DOCUMENT = case(
+    (func.cardinality(Dataset.policy_ids) == 0, Dataset.dataset_data),
+    else_=Dataset.dataset_data.op("||", return_type=JSONB)(func.jsonb_build_object("hasPolicy", _hydrated_offers)),
+)
+
+# DSP contract negotiation, this node being the provider. Transitions are
+# applied with UPDATE ... WHERE version = <read version> (optimistic concurrency)
+# and stay HOT updates, the migration sets fillfactor 80.
+class ContractNegotiationDB(Base):
+    __tablename__ = "contract_negotiations"
+
+    provider_pid = Column(Text, primary_key=True)
+    consumer_pid = Column(Text, nullable=False)
+    state = Column(Text, nullable=False)
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    # Offer target
+    dataset_id = Column(Text)
+    offer = Column(JSONB, nullable=False)
+    agreement = Column(JSONB)
+    callback_address = Column(Text, nullable=False)
+    created = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # A consumer starts one negotiation per consumerPid, a repeated request returns it
+        Index("ix_contract_negotiations_consumer_pid", "consumer_pid", unique=True),
+    )
+
+# DSP message to a counterparty, written in the transaction of the state change
+# that produces it and deleted once delivered by core.outbox
+class OutboxMessageDB(Base):
+    __tablename__ = "outbox_messages"
+
+    id = Column(BigInteger, primary_key=True)
+    target = Column(Text, nullable=False)
+    message = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    # Unset once delivery is given up
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_error = Column(Text)
+    created = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        # Messages due for delivery
+        Index(
+            "ix_outbox_messages_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("next_attempt_at IS NOT NULL"),
+        ),
+    )
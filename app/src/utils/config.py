@@ -29,6 +29,62 @@ class Settings(BaseSettings):
     CLIENT_ID: str = ""
     DATABASE_URL: str
     DATABASE_TABLE: str = os.getenv("DATABASE_TABLE", "items")
+    # Bulk ingestion of Thing Descriptions
+    BULK_BATCH_SIZE: int = 500 # Rows per multi-row INSERT
+    BULK_MAX_ITEM_BYTES: int = 1048576 # Largest single TD accepted in a bulk body
+    # Directory export
+    EXPORT_BATCH_SIZE: int = 1000 # Rows fetched per server-side cursor round trip
+    EXPORT_CHUNK_BYTES: int = 65536 # Response chunk size
+    # In-process cache of GET /things/{id} and /things/oid/{oid} responses
+    TD_CACHE_SIZE: int = 10000 # Max cached TDs, 0 disables the cache
+    TD_CACHE_TTL_SECONDS: float = 30 # Bounds staleness across workers
+    # Server-Sent Events change feed
+    SSE_BUFFER_SIZE: int = 1000 # Pending events per subscriber before it is dropped
+    SSE_HISTORY_SIZE: int = 10000 # Recent events kept for Last-Event-ID resume
+    SSE_HEARTBEAT_SECONDS: float = 15
+    PROJECTION_MAX_FIELDS: int = 50 # Max members of a `fields` projection
+    # JSONPath search
+    JSONPATH_CACHE_SIZE: int = 1024 # Translated expressions kept in memory
+    JSONPATH_MAX_LENGTH: int = 2048
+    JSONPATH_TIMEOUT_MS: int = 2000 # statement_timeout of a single search
+    # Counts
+    COUNT_EXACT_CAP: int = 10000 # Filtered counts above this are estimated
+    COUNT_TIMEOUT_MS: int = 500 # statement_timeout of an exact count
+    # W3C TD 1.1 JSON Schema validation of created Thing Descriptions
+    TD_VALIDATION: bool = True
+    TD_VALIDATION_WORKERS: int = 2 # Validation processes, 0 validates on the event loop
+    TD_VALIDATION_OFFLOAD_BYTES: int = 65536 # Smaller TDs are validated inline
+    # Storage of TD subtrees shared by devices of the same model (@context, securityDefinitions, forms)
+    TD_STORAGE_MODE: str = "INLINE" # [INLINE, DEDUP] DEDUP stores them once in td_fragments
+    TD_FRAGMENT_MIN_BYTES: int = 128 # Smaller subtrees stay inline
+    TD_FRAGMENT_CACHE_SIZE: int = 10000 # Hot fragments kept in memory
+    TD_FRAGMENT_MATCH_LIMIT: int = 1000 # Fragments matched by a search before falling back to a join
+    # DSP catalog
+    CATALOG_CONTEXT: str = "https://w3id.org/dspace/2025/1/context.jsonld"
+    CATALOG_ID: str = "urn:uuid:3afeadd8-ed2d-569e-d634-8394a8836d57"
+    CATALOG_PARTICIPANT_ID: str = "urn:kezmarok:city-data-provider"
+    CATALOG_SERVICE_ID: str = "urn:uuid:4aa2dcc8-4d2d-569e-d634-8394a8834d77"
+    CATALOG_ENDPOINT_URL: str = "https://egov.kezmarok.sk/dataspace-connector"
+    CATALOG_SYNC_SECONDS: float = 5 # Change feed polling interval, bounds staleness towards writes of other workers
+    CATALOG_SYNC_BATCH_SIZE: int = 1000 # Changes read per query of the catalog sync
+    CATALOG_PAGE_SIZE: int = 100 # Datasets per catalog page
+    CATALOG_MAX_PAGE_SIZE: int = 1000
+    CATALOG_UPSERT_BATCH_SIZE: int = 1000 # Datasets per INSERT ... ON CONFLICT of a bulk upsert
+    CATALOG_LOOKUP_MAX_IDS: int = 10000 # Dataset ids per batch lookup
+    # ODRL policies
+    POLICY_CACHE_SIZE: int = 10000 # Compiled policies kept in memory
+    # Outbox of DSP messages to counterparties (callbackAddress)
+    OUTBOX_BATCH_SIZE: int = 100 # Messages claimed per round trip
+    OUTBOX_MAX_IN_FLIGHT: int = 500 # Messages being delivered by a worker
+    OUTBOX_HOST_CONCURRENCY: int = 8 # Concurrent requests per counterparty host
+    OUTBOX_TIMEOUT_SECONDS: float = 10 # Timeout of a single delivery
+    OUTBOX_POLL_SECONDS: float = 2 # Pick up due retries and messages written by other workers
+    OUTBOX_LEASE_SECONDS: float = 120 # A claimed message not delivered by then (crash) is sent again
+    OUTBOX_BACKOFF_SECONDS: float = 1 # First retry delay, doubled on every attempt
+    OUTBOX_MAX_BACKOFF_SECONDS: float = 600
+    OUTBOX_MAX_ATTEMPTS: int = 15 # Then the message is kept, with next_attempt_at unset
+    # Read responses
+    STRICT_RESPONSE_VALIDATION: bool = False # Validate stored documents again through the response models on read, for debugging
 
     @property
     def SQL_LOG(self) -> bool:
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def make_etag(resource_id: int, updated: datetime) -> str:
+    """Strong ETag of a resource version, derived from its id and last update time"""
+    return f'"{resource_id}-{(updated - _EPOCH) // _MICROSECOND}"'
+
+
+def parse_etag(etag: str) -> Optional[tuple]:
+    """`(id, updated)` encoded in an ETag made by make_etag, None when it is foreign"""
+    if etag.startswith("W/"):
+        return None
+    try:
+        resource_id, micros = etag.strip('"').split("-")
+        return int(resource_id), _EPOCH + int(micros) * _MICROSECOND
+    except ValueError:
+        return None
+
+
+def split_etags(header: str) -> List[str]:
+    """Entity tags listed in an If-Match / If-None-Match header"""
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison used by If-None-Match (RFC 9110)"""
+    if not header:
+        return False
+    tags = split_etags(header)
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def expected_versions(header: Optional[str], resource_id: int) -> Optional[List[datetime]]:
+    """Versions an If-Match header allows for a resource
+
+    None means unconditional (no header or `*`), an empty list means no
+    version can match and the request must fail with 412.
+    """
+    if not header:
+        return None
+    tags = split_etags(header)
+    if "*" in tags:
+        return None
+    versions = []
+    for tag in tags:
+        parsed = parse_etag(tag)
+        if parsed and parsed[0] == resource_id:
+            versions.append(parsed[1])
+    return versions
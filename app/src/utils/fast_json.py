@@ -0,0 +1,28 @@
+from typing import Any, Iterable
+import orjson
+from fastapi.responses import Response
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes of plain data, UUIDs and datetimes included"""
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def join_array(items: Iterable[bytes]) -> bytes:
+    """JSON array of already serialized items"""
+    return b"[" + b",".join(items) + b"]"
+
+
+class FastJSONResponse(Response):
+    """JSON response serialized with orjson, bytes are sent as they are
+
+    Returned by read endpoints instead of letting FastAPI validate the result
+    through the response_model, the data was validated when it was written.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
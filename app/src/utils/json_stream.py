@@ -0,0 +1,134 @@
+import codecs
+import json
+from typing import Any, AsyncIterator, Tuple, Union
+
+_WHITESPACE = " \t\r\n"
+# No array item read yet, None being a valid one
+_NOTHING = object()
+
+
+class JSONStreamError(ValueError):
+    """Raised when the body cannot be split into JSON documents anymore"""
+
+
+async def iter_json_documents(
+    chunks: AsyncIterator[bytes], max_item_bytes: int
+) -> AsyncIterator[Tuple[int, Union[Any, ValueError]]]:
+    """Incrementally parse an NDJSON or JSON array body
+
+    Yields `(index, document)` for every item, or `(index, error)` for NDJSON lines
+    that are not valid JSON. At most one item is buffered at a time, so memory stays
+    bounded by `max_item_bytes`. A body starting with `[` is read as a JSON array,
+    its items must be separated by `,` and closed by `]` or JSONStreamError is
+    raised.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = json.JSONDecoder()
+    buffer = ""
+    array = None
+    pending = _NOTHING
+    index = 0
+    position = 0
+    finished = False
+
+    async def fill() -> bool:
+        nonlocal buffer, finished
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            buffer += decoder.decode(b"", final=True)
+            finished = True
+            return False
+        buffer += decoder.decode(chunk)
+        return True
+
+    while True:
+        if array is None:
+            stripped = buffer.lstrip(_WHITESPACE)
+            if stripped:
+                array = stripped[0] == "["
+                buffer = stripped[1:] if array else stripped
+            elif not await fill():
+                return
+            continue
+
+        if not array:
+            newline = buffer.find("\n", position)
+            if newline < 0:
+                position = len(buffer)
+                if len(buffer) > max_item_bytes:
+                    raise JSONStreamError(f"Item {index} exceeds {max_item_bytes} bytes")
+                if await fill():
+                    continue
+                newline = len(buffer)
+            line, buffer, position = buffer[:newline].strip(), buffer[newline + 1:], 0
+            if line:
+                try:
+                    yield index, json.loads(line)
+                except ValueError as e:
+                    yield index, e
+                index += 1
+            if finished and not buffer:
+                return
+            continue
+
+        buffer = buffer.lstrip(_WHITESPACE)
+        if pending is not _NOTHING:
+            # An item is only yielded once the ',' or ']' after it is read
+            if buffer:
+                if buffer[0] not in ",]":
+                    raise JSONStreamError(f"Expected ',' or ']' after item {index}")
+                closed, buffer = buffer[0] == "]", buffer[1:]
+                document, pending = pending, _NOTHING
+                yield index, document
+                index += 1
+                if closed:
+                    return
+                continue
+        elif buffer:
+            if buffer[0] == "]" and index == 0:
+                return
+            if buffer[0] in ",]":
+                raise JSONStreamError(f"Expected a value at item {index}")
+            try:
+                document, end = parser.raw_decode(buffer)
+            except ValueError:
+                # Item is incomplete, or broken if no more data arrives
+                if len(buffer) > max_item_bytes:
+                    raise JSONStreamError(f"Item {index} exceeds {max_item_bytes} bytes")
+            else:
+                # A number may continue in the next chunk
+                if end < len(buffer) or finished or not isinstance(document, (int, float)):
+                    buffer, pending = buffer[end:], document
+                    continue
+        if not finished:
+            # Once the body has ended, the buffer is parsed one last time
+            await fill()
+            continue
+        if pending is _NOTHING and buffer:
+            raise JSONStreamError(f"Malformed JSON array at item {index}")
+        raise JSONStreamError("Unterminated JSON array")
+
+
+async def peek_json_documents(
+    chunks: AsyncIterator[bytes], max_item_bytes: int
+) -> AsyncIterator[Tuple[int, Union[Any, ValueError]]]:
+    """iter_json_documents with its first item already read
+
+    A body that is malformed from the start raises JSONStreamError here, while
+    the request can still be answered with an error status.
+    """
+    documents = iter_json_documents(chunks, max_item_bytes)
+    try:
+        first = await documents.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def resumed():
+        if first is None:
+            return
+        yield first
+        async for item in documents:
+            yield item
+
+    return resumed()
@@ -0,0 +1,107 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+from fastapi import Request
+from sqlalchemy import Select, tuple_
+
+# Keyset orders: by id, or by (updated, id)
+ORDERS = ("id", "updated")
+
+
+def encode_cursor(position: dict) -> str:
+    """Encode a keyset position into an opaque URL safe cursor"""
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode an opaque cursor, raises ValueError when it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeEncodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def build_link_header(request: Request, next_cursor: Optional[str], prev_cursor: Optional[str]) -> Optional[str]:
+    """Build an RFC 8288 Link header pointing to the next and previous pages"""
+    links = []
+    base_url = request.url.remove_query_params(["skip", "cursor"])
+    for rel, cursor in (("next", next_cursor), ("prev", prev_cursor)):
+        if cursor:
+            links.append(f'<{base_url.include_query_params(cursor=cursor)}>; rel="{rel}"')
+    return ", ".join(links) or None
+
+
+def keyset_order(cursor: Optional[dict], order: str) -> Tuple[str, bool]:
+    """Order of a page, the one of the cursor if any, and whether it is read backwards"""
+    if cursor:
+        order = cursor.get("order", order)
+    if order not in ORDERS:
+        raise ValueError(f"Unsupported order: {order}")
+    return order, bool(cursor) and cursor.get("dir") == "prev"
+
+
+def keyset_query(
+    query: Select, key: tuple, limit: int, cursor: Optional[dict], order: str, backwards: bool, id_type: type
+) -> Select:
+    """Rows of `query` past the cursor in `key` order, one more than `limit` to detect a next page
+
+    `key` holds the `id` column, preceded by the `updated` one when ordered by
+    update. Raises ValueError for a cursor without valid keyset values.
+    """
+    if cursor:
+        position = cursor_values(cursor, order, id_type)
+        column = tuple_(*key) if len(key) > 1 else key[0]
+        value = tuple_(*position) if len(key) > 1 else position[0]
+        query = query.where(column < value if backwards else column > value)
+    ordering = [c.desc() if backwards else c.asc() for c in key]
+    return query.order_by(*ordering).limit(limit + 1)
+
+
+def keyset_page(
+    rows: List[Any], limit: int, cursor: Optional[dict], order: str, backwards: bool, key_of: Callable[[Any], tuple]
+) -> Tuple[List[Any], Optional[dict], Optional[dict]]:
+    """Page of the rows of a keyset_query, with the positions of the next and previous pages
+
+    `key_of` gives the keyset values of a row, in `key` order. Positions are
+    None when there is no such page.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        # Past either end, only offer the way back
+        back = dict(cursor, dir="next" if backwards else "prev") if cursor else None
+        return rows, (back if backwards else None), (None if backwards else back)
+
+    next_cursor = cursor_for(key_of(rows[-1]), order, "next") if (has_more or backwards) else None
+    prev_cursor = cursor_for(key_of(rows[0]), order, "prev") if (has_more if backwards else cursor) else None
+    return rows, next_cursor, prev_cursor
+
+
+def cursor_for(values: tuple, order: str, direction: str) -> dict:
+    """Keyset position of a row from its keyset values"""
+    cursor = {"order": order, "dir": direction, "id": values[-1]}
+    if order == "updated":
+        cursor["updated"] = values[0].isoformat()
+    return cursor
+
+
+def cursor_values(cursor: dict, order: str, id_type: type) -> tuple:
+    """Keyset values of a decoded cursor, raises ValueError when they are invalid"""
+    try:
+        row_id = cursor["id"]
+        if not isinstance(row_id, id_type) or isinstance(row_id, bool):
+            raise TypeError(f"id must be {id_type.__name__}")
+        if order == "updated":
+            return (datetime.fromisoformat(cursor["updated"]), row_id)
+        return (row_id,)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e